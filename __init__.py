@@ -9,6 +9,7 @@ bl_info = {
 import bpy
 import os
 import json
+import shutil
 from bpy.types import Panel, Operator, PropertyGroup, Object, Action, UIList, Scene
 from bpy_extras.io_utils import ExportHelper, ImportHelper
 from bpy.props import StringProperty, FloatProperty,BoolProperty, PointerProperty, CollectionProperty, IntProperty, EnumProperty, FloatVectorProperty
@@ -24,6 +25,7 @@ SPRITE_SHEET_NAME = "sprite_sheet"
 DEFAULT_OUTPUT_FOLDER_NAME = "SpriteSheetMaker"
 DEFAULT_SETTINGS_FILE_NAME = "ssm_settings.json"
 PIXELATE_TEST_IMAGE_POSTFIX = "pixelated"
+PREVIEW_POSTFIX = "preview"
 UNTITLED_ROW_NAME = "<Untitled>"
 UNTITLED_LABEL_TEXT = "Untitled"
 NON_SERIALIZABLE_PROPERTIES = {"custom_camera", "h_center_object", "v_center_object"} 
@@ -177,6 +179,28 @@ class SSM_RowInfo(PropertyGroup):
     pixelation_amount: FloatProperty(name="Pixelation Amount", default=0.9, precision=5, step=0.001, min=0.0, max=1.0, description="By how much amount to pixelate the row\nHold Alt & change to sync across all rows", update=lambda self, ctx: self.alt_sync_update(ctx, "pixelation_amount"))
     color_amount: FloatProperty(name="Pixelation Color Amount", default=50.0, min=0.0, soft_max=1000, description="How much amount of color to keep within the row\nHold Alt & change to sync across all rows", update=lambda self, ctx: self.alt_sync_update(ctx, "color_amount"))
     min_alpha: FloatProperty(name="Min Alpha", default=0.0, min=0.0, max=1.1, description="If any pixel in the row has a transparency less than this amount then it is discarded\nSet as 1.0 if to remove all semi-transparent pixel\nHold Alt & change to sync across all rows", update=lambda self, ctx: self.alt_sync_update(ctx, "min_alpha"))
+    pixelate_engine: EnumProperty(
+        name="Pixelate Engine",
+        description="Dictates how frames are pixelated\nHold Alt & change to sync across all rows",
+        items=[
+            (PixelateEngine.COMPOSITOR.value, "Compositor", "Render every frame through the pixelate scene's compositor, colors follow its view transform"),
+            (PixelateEngine.NUMPY.value, "NumPy", "Run the same pixelation math on whole batches of frames with NumPy, much faster & frames are never re-saved in between\nColors go through the pixelate scene's view transform as well")
+        ],
+        default=PixelateEngine.COMPOSITOR.value,
+        update=lambda self, ctx: self.alt_sync_update(ctx, "pixelate_engine")
+    )
+    palette_scope: EnumProperty(
+        name="Palette",
+        description="Frames sharing one palette after pixelating, shared palettes keep colors from flickering between frames & compress better\nHold Alt & change to sync across all rows",
+        items=[
+            (PaletteScope.FRAME.value, "Per Frame", "Every frame keeps its own colors"),
+            (PaletteScope.ROW.value, "Per Row", "All frames of this row are mapped onto one palette"),
+            (PaletteScope.SHEET.value, "Per Sheet", "All frames of every row set to 'Per Sheet' are mapped onto one palette")
+        ],
+        default=PaletteScope.FRAME.value,
+        update=lambda self, ctx: self.alt_sync_update(ctx, "palette_scope")
+    )
+    palette_size: IntProperty(name="Palette Size", default=32, min=2, max=256, description="Colors in the shared palette (Rows sharing the sheet's palette use the largest of their sizes)\nHold Alt & change to sync across all rows", update=lambda self, ctx: self.alt_sync_update(ctx, "palette_size"))
     alpha_step: FloatProperty(name="Alpha Step", default=0.0, min=0.0, max=1.1, description="Ensures that all pixels have a transparency which is a multiple of this amount\nHold Alt & change to sync across all rows", update=lambda self, ctx: self.alt_sync_update(ctx, "alpha_step"))
     pixelate_image_path: StringProperty(
         name="Pixelate Image Path",
@@ -187,8 +211,8 @@ class SSM_RowInfo(PropertyGroup):
     
     
     # Flip settings
-    to_flip_h: BoolProperty(name="To Flip H", default=False, description="If enabled the rendered image is flipped horizontally before saving into temp folder\nHold Alt & change to sync across all rows", update=lambda self, ctx: self.alt_sync_update(ctx, "to_flip_h"))
-    to_flip_v: BoolProperty(name="To Flip V", default=False, description="If enabled the rendered image is flipped vertically before saving into temp folder\nHold Alt & change to sync across all rows", update=lambda self, ctx: self.alt_sync_update(ctx, "to_flip_v"))
+    to_flip_h: BoolProperty(name="To Flip H", default=False, description="If enabled the rendered image is flipped horizontally while combining (Frames in temp folder are left as rendered)\nHold Alt & change to sync across all rows", update=lambda self, ctx: self.alt_sync_update(ctx, "to_flip_h"))
+    to_flip_v: BoolProperty(name="To Flip V", default=False, description="If enabled the rendered image is flipped vertically while combining (Frames in temp folder are left as rendered)\nHold Alt & change to sync across all rows", update=lambda self, ctx: self.alt_sync_update(ctx, "to_flip_v"))
     
     
     # Manual frame settings
@@ -228,6 +252,9 @@ class SSM_Properties(PropertyGroup):
     surrounding_margin_left: IntProperty(name="Surrounding Margin Left", default=15, min=0, soft_max=1000, description="Margin (in pixels) to add to the left of the sprite sheet")
     label_margin: IntProperty(name="Label Margin", default=15, min=0, soft_max=1000, description="Vertical margin gap (in pixels) between the label and the images")
     image_margin: IntProperty(name="Image Margin", default=15, min=0, soft_max=1000, description="Horizonal margin gap (in pixels) between images within a row/row")
+    max_columns: IntProperty(name="Max Columns", default=0, min=0, soft_max=1000, description="Frames per line of a row, longer rows wrap onto extra lines under the same label\n0 means no limit, Only applies to 'Sheet' combine mode")
+    target_aspect: FloatProperty(name="Target Aspect", default=0.0, min=0.0, soft_max=4.0, description="Width / height the sheet aims for by picking how many frames per line rows wrap at (1 = square), never more than 'Max Columns' if set\n0 means off, Only applies to 'Sheet' combine mode")
+    max_texture_size: IntProperty(name="Max Texture Size", default=0, min=0, soft_max=16384, description="Largest width & height (in pixels) of the output, rows too wide for it wrap, rows (Or frames in Atlas mode) that don't fit spill onto extra pages & rows too tall for a page are split across them saved as '<name>_0', '<name>_1' and so on\n0 means no limit, Only applies to 'Sheet' & 'Atlas' combine modes")
     sprite_consistency: EnumProperty(
         name="Sprite Align",
         description="Dictates the dimension of sprites throughout the sprite sheet",
@@ -261,9 +288,68 @@ class SSM_Properties(PropertyGroup):
             (CombineMode.IMAGES.value, "Images", "Render out individual images"),
             (CombineMode.STRIPS.value, "Rows", "Render out separate row strips"),
             (CombineMode.SHEET.value, "Sheet", "Render out a single sprite sheet"),
+            (CombineMode.ATLAS.value, "Atlas", "Render out a tightly packed sprite atlas along with a .json file of frame rects"),
         ],
         default=CombineMode.SHEET.value
     )
+    trim_transparent: BoolProperty(name="Trim Transparent Borders", default=False, description="If enabled, every sprite is cropped to its non transparent content before being combined so sprite dimensions shrink accordingly")
+    deduplicate_frames: BoolProperty(name="Deduplicate Frames", default=False, description="If enabled, pixel identical sprites are stored only once in 'Atlas' combine mode and all their frames point to the same rect")
+    stream_output: BoolProperty(name="Stream Sheet Output", default=False, description="If enabled, the sprite sheet is written into the .png one row at a time so the whole sheet is never held in memory\nUseful for very large sheets, only applies to 'Sheet' combine mode with .png output")
+    metadata_format: EnumProperty(
+        name="Metadata Format",
+        description="Engine metadata (Frame rects, pivots, durations & animations) saved next to the sprite sheet\nOnly applies to 'Sheet' & 'Atlas' combine modes",
+        items=[
+            (MetadataFormat.NONE.value, "None", "Don't save any metadata (Atlas mode still saves its own .json file of frame rects)"),
+            (MetadataFormat.JSON_ARRAY.value, "JSON Array", "Generic .json with frames listed in an array"),
+            (MetadataFormat.JSON_HASH.value, "JSON Hash", "Generic .json with frames keyed by name"),
+            (MetadataFormat.GODOT.value, "Godot SpriteFrames", "Godot 4 SpriteFrames .tres with an animation per row"),
+            (MetadataFormat.UNITY.value, "Unity Sprites", "Sprite rects & pivots for slicing in Unity along with an animation per row")
+        ],
+        default=MetadataFormat.NONE.value
+    )
+    indexed_output: BoolProperty(name="Indexed Output", default=False, description="If enabled, the sprite sheet is saved as an indexed image with one palette shared by every frame, transparency is kept\nColors are exact as long as no more than 256 are used, only applies to 'Sheet' & 'Atlas' combine modes")
+    incremental_assembly: BoolProperty(name="Incremental Assembly", default=False, description="If enabled, every row of the sprite sheet is cached inside the temp folder and only rows whose frames changed since the previous run are combined again\nOnly applies to 'Sheet' combine mode")
+    encoder_profile: EnumProperty(
+        name="Encoder Profile",
+        description="Trade off between how fast output images are saved and how small they are",
+        items=[
+            (EncoderProfile.FAST.value, "Fast", "Save as fast as possible, useful while iterating"),
+            (EncoderProfile.BALANCED.value, "Balanced", "Default compression"),
+            (EncoderProfile.SMALLEST.value, "Smallest", "Spend extra time to get the smallest files, useful for final builds")
+        ],
+        default=EncoderProfile.BALANCED.value
+    )
+    output_format: EnumProperty(
+        name="Output Format",
+        description="File format of the combined output",
+        items=[
+            (OutputFormat.AUTO.value, "Same as Render", "Use the file format set in Blender's output properties"),
+            (OutputFormat.PNG.value, "PNG", "Save as .png"),
+            (OutputFormat.WEBP.value, "WebP (Lossless)", "Save as lossless .webp, usually much smaller than .png")
+        ],
+        default=OutputFormat.AUTO.value
+    )
+    composite_backend: EnumProperty(
+        name="Composite Backend",
+        description="Dictates how sprites are pasted together",
+        items=[
+            (CompositeBackend.PILLOW.value, "Pillow", "Paste every sprite using Pillow"),
+            (CompositeBackend.NUMPY.value, "NumPy", "Paste sprites into a preallocated NumPy array, faster for large sheets\nFalls back to Pillow if NumPy is not available")
+        ],
+        default=CompositeBackend.PILLOW.value
+    )
+    preview_scale: EnumProperty(
+        name="Preview Scale",
+        description="Scale of the quick preview made by 'Preview', frames are decoded at this scale & the whole layout shrinks to match",
+        items=[
+            ("2", "1/2", "Half size preview"),
+            ("4", "1/4", "Quarter size preview"),
+            ("8", "1/8", "Eighth size preview")
+        ],
+        default="4"
+    )
+    prefetch_depth: IntProperty(name="Prefetch Depth", default=4, min=0, soft_max=64, description="Frames decoded ahead on background threads while the current one is pasted, higher uses more memory\n0 means frames are decoded one at a time while pasting")
+    frame_memory_limit: IntProperty(name="Frame Memory Limit", default=1024, min=0, soft_max=16384, description="MB of decoded frames kept in memory between capturing & combining, frames past this are memory mapped from raw files in the temp folder instead\nOnly frames edited after rendering are kept")
     delete_temp_folder: BoolProperty(name="Delete Temp Folder", default=True, description="Whether to delete the cache folder after sprite sheet is made\nHowever the folder will not be deleted incase of any error even if this is enabled")
     temp_folder: StringProperty(
         name="Temp Folder",
@@ -751,6 +837,8 @@ class SSM_OT_PixelateImage(Operator):
             param = gen_pixelate_param(curr_row)
             pixelated_output_path = get_pixelated_img_path()
             pixelate_images({ curr_row.pixelate_image_path:pixelated_output_path }, param)
+            if(param.palette_scope != PaletteScope.FRAME):
+                quantize_frames_to_palette([pixelated_output_path], param.palette_size)
 
             # Notify success
             log(f"Pixelated image successfully at {pixelated_output_path}", True)
@@ -765,6 +853,8 @@ class SSM_OT_CombineSprites(Operator):
     bl_description = "Combine all sprites from Temp Folder into a single sprite sheet"
     bl_options = {'REGISTER', 'UNDO'}
 
+    preview: BoolProperty(default=False, options={'SKIP_SAVE'}, description="Make a reduced scale preview instead, overwriting the previous preview")
+
     def execute(self, context):
 
         # Get props
@@ -786,8 +876,12 @@ class SSM_OT_CombineSprites(Operator):
         # Combine sprites from temp folder
         try:
             param = gen_assemble_param()
+            if(self.preview):
+                param.preview_scale = int(props.preview_scale)
             input_folder_path = props.temp_folder
-            output_path = get_sprite_sheet_path(props.combine_mode)
+            output_path = get_sprite_sheet_path(props.combine_mode, preview=self.preview)
+            if(self.preview and os.path.isdir(output_path)):
+                shutil.rmtree(output_path)  # Previous preview's strips or images, so rows that are gone don't linger
             assemble_images(param, input_folder_path, output_path)
             log(f"Combined sprites successfully at {os.path.normpath(output_path)}", True)
         except Exception as e:
@@ -1066,6 +1160,10 @@ class SSM_PT_MainPanel(Panel):
             sub_col.prop(row, "color_amount", text="Color Amount")  # Color Amount
             sub_col.prop(row, "min_alpha", text="Min Alpha")  # Min Alpha
             sub_col.prop(row, "alpha_step", text="Alpha Step")  # Alpha Step
+            sub_col.prop(row, "pixelate_engine", text="Engine")  # Engine
+            sub_col.prop(row, "palette_scope", text="Palette")  # Palette
+            if row.palette_scope != PaletteScope.FRAME.value:
+                sub_col.prop(row, "palette_size", text="Palette Size")  # Palette Size
 
             # Test Image
             ui_line = sub_col.row()
@@ -1197,12 +1295,80 @@ class SSM_PT_MainPanel(Panel):
             split.label(text="Sprite Align")
             split.prop(props, "sprite_align", text="")
 
+            # Trim Transparent Borders
+            box.prop(props, "trim_transparent", text="Trim Transparent Borders")
+
             # Combine Mode
             ui_line = box.row()
             split = ui_line.split(factor=0.60)
             split.label(text="Combine Mode")
             split.prop(props, "combine_mode", text="")
 
+            # Deduplicate Frames
+            if props.combine_mode == CombineMode.ATLAS.value:
+                box.prop(props, "deduplicate_frames", text="Deduplicate Frames")
+
+            # Indexed Output & Metadata Format
+            if props.combine_mode in [CombineMode.SHEET.value, CombineMode.ATLAS.value]:
+                box.prop(props, "indexed_output", text="Indexed Output")
+                ui_line = box.row()
+                split = ui_line.split(factor=0.60)
+                split.label(text="Metadata Format")
+                split.prop(props, "metadata_format", text="")
+                ui_line = box.row()
+                split = ui_line.split(factor=0.60)
+                split.label(text="Max Texture Size")
+                split.prop(props, "max_texture_size", text="")
+
+            # Stream Sheet Output, Incremental Assembly & Row Wrapping
+            if props.combine_mode == CombineMode.SHEET.value:
+                ui_line = box.row()
+                split = ui_line.split(factor=0.60)
+                split.label(text="Max Columns")
+                split.prop(props, "max_columns", text="")
+                ui_line = box.row()
+                split = ui_line.split(factor=0.60)
+                split.label(text="Target Aspect")
+                split.prop(props, "target_aspect", text="")
+                box.prop(props, "stream_output", text="Stream Sheet Output")
+                box.prop(props, "incremental_assembly", text="Incremental Assembly")
+
+            # Output Format
+            ui_line = box.row()
+            split = ui_line.split(factor=0.60)
+            split.label(text="Output Format")
+            split.prop(props, "output_format", text="")
+
+            # Encoder Profile
+            ui_line = box.row()
+            split = ui_line.split(factor=0.60)
+            split.label(text="Encoder Profile")
+            split.prop(props, "encoder_profile", text="")
+
+            # Composite Backend
+            ui_line = box.row()
+            split = ui_line.split(factor=0.60)
+            split.label(text="Composite Backend")
+            split.prop(props, "composite_backend", text="")
+
+            # Prefetch Depth
+            ui_line = box.row()
+            split = ui_line.split(factor=0.60)
+            split.label(text="Prefetch Depth")
+            split.prop(props, "prefetch_depth", text="")
+
+            # Preview Scale
+            ui_line = box.row()
+            split = ui_line.split(factor=0.60)
+            split.label(text="Preview Scale")
+            split.prop(props, "preview_scale", text="")
+
+            # Frame Memory Limit
+            ui_line = box.row()
+            split = ui_line.split(factor=0.60)
+            split.label(text="Frame Memory Limit (MB)")
+            split.prop(props, "frame_memory_limit", text="")
+
             # Delete Temp Folder
             box.prop(props, "delete_temp_folder", text="Delete Temp Folder")
         
@@ -1215,6 +1381,7 @@ class SSM_PT_MainPanel(Panel):
             # Combine Sprites Button
             ui_line = box.row()
             ui_line.operator("spritesheetmaker.combine_sprites", text="Combine Sprites", icon="TEXTURE")
+            ui_line.operator("spritesheetmaker.combine_sprites", text="Preview", icon="HIDE_OFF").preview = True
 
 
         # Output folder
@@ -1237,6 +1404,8 @@ class SSM_PT_MainPanel(Panel):
             create_btn_text = "Create Sprite Sheet"
         elif props.combine_mode == CombineMode.STRIPS.value:
             create_btn_text = "Create Sprite Rows"
+        elif props.combine_mode == CombineMode.ATLAS.value:
+            create_btn_text = "Create Sprite Atlas"
         else:
             create_btn_text = "Create Sprite Images"
 
@@ -1256,7 +1425,7 @@ def gen_assemble_param():
     # Set assemble parameters
     param = AssembleParam()
     for prop in param.__dict__:
-        if hasattr(props, prop) and prop not in ["surrounding_margin", "consistency", "align", "combine_mode", "label_color", "background_color"]:
+        if hasattr(props, prop) and prop not in ["surrounding_margin", "consistency", "align", "combine_mode", "composite_backend", "encoder_profile", "output_format", "metadata_format", "preview_scale", "label_color", "background_color"]:
             setattr(param, prop, getattr(props, prop))
     
 
@@ -1265,6 +1434,11 @@ def gen_assemble_param():
     param.consistency = SpriteConsistency(props.sprite_consistency)
     param.align = SpriteAlign(props.sprite_align)
     param.combine_mode = CombineMode(props.combine_mode)
+    param.composite_backend = CompositeBackend(props.composite_backend)
+    param.encoder_profile = EncoderProfile(props.encoder_profile)
+    param.output_format = OutputFormat(props.output_format)
+    param.metadata_format = MetadataFormat(props.metadata_format)
+    param.frame_rate = bpy.context.scene.render.fps / bpy.context.scene.render.fps_base
     param.font_size = props.label_font_size
     param.label_color = tuple(props.label_color)
     param.background_color = tuple(props.background_color)
@@ -1295,10 +1469,15 @@ def gen_pixelate_param(row):
 
     # Auto copy all matching properties
     for prop in param.__dict__:
-        if hasattr(row, prop):
+        if hasattr(row, prop) and prop not in ["palette_scope"]:
             setattr(param, prop, getattr(row, prop))
 
 
+    # Manual overrides for Enums
+    param.engine = PixelateEngine(row.pixelate_engine)
+    param.palette_scope = PaletteScope(row.palette_scope)
+
+
     return param
 def gen_row_param(row):
     row_param = RowParam()
@@ -1403,15 +1582,23 @@ def get_pixelated_img_path():
     
 
     return unique_path(pixelated_output_path)
-def get_sprite_sheet_path(mode, single_sprite = False):
+def get_sprite_sheet_path(mode, single_sprite = False, preview = False):
     props = bpy.context.scene.sprite_sheet_maker_props
     file_ext = bpy.context.scene.render.image_settings.file_format.lower()
+    if(props.output_format != OutputFormat.AUTO.value):
+        file_ext = OUTPUT_FORMAT_EXTENSIONS[OutputFormat(props.output_format)][1:]
 
     # Assign file/folder name
     if(single_sprite):
         base_name = f"{SINGLE_SPRITE_NAME}.{file_ext}"
     else:
-        base_name = f"{SPRITE_SHEET_NAME}.{file_ext}" if mode == CombineMode.SHEET.value else DEFAULT_OUTPUT_FOLDER_NAME
+        base_name = f"{SPRITE_SHEET_NAME}.{file_ext}" if mode in [CombineMode.SHEET.value, CombineMode.ATLAS.value] else DEFAULT_OUTPUT_FOLDER_NAME
+
+
+    # Previews always overwrite the same file/folder
+    if(preview):
+        name, ext = os.path.splitext(base_name)
+        return f"{props.output_folder}/{name}_{PREVIEW_POSTFIX}{ext}"
 
 
     # Get full path
@@ -0,0 +1,136 @@
+import os
+import time
+import shutil
+import random
+import argparse
+import tempfile
+from PIL import Image, ImageDraw
+from modules.combine_frames import AssembleParam, CombineMode, CompositeBackend, assemble_images
+from modules.frame_layout import build_layout, calc_layout, clear_layout_cache
+
+
+# Properties
+DEFAULT_ROWS = 16
+DEFAULT_FRAMES = 60
+DEFAULT_FRAME_SIZE = 256
+DEFAULT_LAYOUT_FRAMES = 100000
+PARITY_BACKGROUNDS = [(0.0, 0.0, 0.0, 0.0), (0.2, 0.4, 0.6, 0.5)]  # Transparent & translucent so both paste paths get checked
+
+
+# Methods
+def generate_frames(temp_dir, row_count, frame_count, frame_size):
+    rnd = random.Random(0)
+    for row in range(row_count):
+        row_dir = os.path.join(temp_dir, f"{row}_Row{row}")
+        os.makedirs(row_dir)
+
+        for frame in range(frame_count):
+            img = Image.new("RGBA", (frame_size, frame_size), (0, 0, 0, 0))
+            draw = ImageDraw.Draw(img)
+            inset = rnd.randint(0, frame_size // 4)
+            color = (rnd.randint(0, 255), rnd.randint(0, 255), rnd.randint(0, 255), rnd.randint(64, 255))
+            draw.ellipse((inset, inset, frame_size - inset, frame_size - 1), fill=color)
+            img.save(os.path.join(row_dir, f"{frame}.png"))
+
+def time_assemble(param, input_dir, output_path):
+    start = time.perf_counter()
+    assemble_images(param, input_dir, output_path)
+    return time.perf_counter() - start
+
+def benchmark_sheet(input_dir, output_dir, worker_counts):
+    results = []
+    for worker_count in worker_counts:
+        param = AssembleParam()
+        param.combine_mode = CombineMode.SHEET
+        param.worker_count = worker_count
+        elapsed = time_assemble(param, input_dir, os.path.join(output_dir, f"sheet_{worker_count}.png"))
+        results.append((f"sheet workers={worker_count}", elapsed))
+    return results
+
+def benchmark_backends(input_dir, output_dir):
+    results = []
+    for background_color in PARITY_BACKGROUNDS:
+        sheets = []
+        for backend in CompositeBackend:
+            param = AssembleParam()
+            param.combine_mode = CombineMode.SHEET
+            param.background_color = background_color
+            param.composite_backend = backend
+            output_path = os.path.join(output_dir, f"sheet_{backend.value}_{len(results)}.png")
+            elapsed = time_assemble(param, input_dir, output_path)
+            results.append((f"sheet backend={backend.value} bg_alpha={background_color[3]}", elapsed))
+            sheets.append(output_path)
+
+
+        # Raise if backends don't give identical pixels
+        with Image.open(sheets[0]) as pillow_sheet, Image.open(sheets[1]) as numpy_sheet:
+            if pillow_sheet.tobytes() != numpy_sheet.tobytes():
+                raise Exception(f"Composite backends differ for background {background_color}")
+        print(f"composite backends match for background {background_color}")
+    return results
+
+def benchmark_layout(row_count, frame_count, frame_size):
+
+    # Layout only needs sizes, so a huge input is generated without touching the disk
+    rnd = random.Random(0)
+    frames_per_row = max(1, frame_count // row_count)
+    frame_sizes = [[(rnd.randint(1, frame_size), rnd.randint(1, frame_size)) for _ in range(frames_per_row)] for _ in range(row_count)]
+    label_sizes = [(0, 0, 0, 0)] * row_count
+
+
+    # Time a fresh layout of every combine mode & a cached one
+    results = []
+    for combine_mode in CombineMode:
+        param = AssembleParam()
+        param.combine_mode = combine_mode
+        start = time.perf_counter()
+        build_layout(param, frame_sizes, label_sizes)
+        results.append((f"layout {combine_mode.value} frames={row_count * frames_per_row}", time.perf_counter() - start))
+
+    clear_layout_cache()
+    param = AssembleParam()
+    calc_layout(param, frame_sizes, label_sizes)
+    start = time.perf_counter()
+    calc_layout(param, frame_sizes, label_sizes)
+    results.append(("layout Sheet cached", time.perf_counter() - start))
+    return results
+
+def print_results(results):
+    baseline = results[0][1]
+    for name, elapsed in results:
+        print(f"{name:<32} {elapsed:8.3f}s  x{baseline / elapsed:.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sprite sheet assembly")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS)
+    parser.add_argument("--frames", type=int, default=DEFAULT_FRAMES)
+    parser.add_argument("--size", type=int, default=DEFAULT_FRAME_SIZE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--layout-frames", type=int, default=DEFAULT_LAYOUT_FRAMES)
+    args = parser.parse_args()
+
+
+    # Generate synthetic frames
+    work_dir = tempfile.mkdtemp(prefix="ssm_benchmark_")
+    input_dir = os.path.join(work_dir, "input")
+    output_dir = os.path.join(work_dir, "output")
+    os.makedirs(input_dir)
+    os.makedirs(output_dir)
+    print(f"generating {args.rows}x{args.frames} frames of {args.size}px in {input_dir}")
+    generate_frames(input_dir, args.rows, args.frames, args.size)
+
+
+    # Run benchmarks (Serial first since every other result is compared against it)
+    try:
+        results = benchmark_sheet(input_dir, output_dir, [1, args.workers])
+        print_results(results)
+        print_results(benchmark_backends(input_dir, output_dir))
+        print_results(benchmark_layout(args.rows, args.layout_frames, args.size))
+    finally:
+        print(f"cleaning up {work_dir}")
+        shutil.rmtree(work_dir)
+
+
+# Main
+if __name__ == "__main__":
+    main()
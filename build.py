@@ -12,6 +12,8 @@ EXCLUDE_PATHS = [
     "images",
     ".gitignore",
     "build.py",
+    "benchmark.py",
+    "tests",
     "README.md"
 ]
 BUILD_ZIP_PREFIX = "sprite_sheet_maker"
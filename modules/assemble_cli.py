@@ -0,0 +1,115 @@
+import os
+import sys
+import time
+import argparse
+import contextlib
+import traceback
+from enum import Enum
+from concurrent.futures import ProcessPoolExecutor
+from .combine_frames import AssembleParam, CombineMode, OUTPUT_FORMAT_EXTENSIONS, assemble_images
+
+
+# Constants
+DEFAULT_OUTPUT_EXTENSION = ".png"  # Used for sheet & atlas when output format is Auto (Frames captured by Blender are png by default)
+PARAM_ARGUMENT_EXCLUSIONS = ["dry_run"]  # AssembleParam fields that make no sense from the command line
+
+
+# Methods
+def add_param_arguments(parser:argparse.ArgumentParser):
+
+    # One option per AssembleParam field so the command line never falls behind new settings (Enums are chosen by lower case name)
+    group = parser.add_argument_group("assemble settings")
+    for name, default in vars(AssembleParam()).items():
+        if name in PARAM_ARGUMENT_EXCLUSIONS:
+            continue
+
+        flag = "--" + name.replace("_", "-")
+        if isinstance(default, bool):
+            group.add_argument(flag, dest=name, action=argparse.BooleanOptionalAction, default=default)
+        elif isinstance(default, Enum):
+            group.add_argument(flag, dest=name, choices=[member.name.lower() for member in type(default)], default=default.name.lower(), help="(default: %(default)s)")
+        elif isinstance(default, tuple):
+            group.add_argument(flag, dest=name, type=type(default[0]), nargs=len(default), default=default, metavar="V", help="(default: %(default)s)")
+        else:
+            group.add_argument(flag, dest=name, type=type(default), default=default, help="(default: %(default)s)")
+def gen_assemble_param(args:argparse.Namespace):
+
+    # Copy every parsed option back onto a fresh AssembleParam
+    param = AssembleParam()
+    for name, default in vars(AssembleParam()).items():
+        if name in PARAM_ARGUMENT_EXCLUSIONS:
+            continue
+
+        value = getattr(args, name)
+        if isinstance(default, Enum):
+            value = type(default)[value.upper()]
+        elif isinstance(default, tuple):
+            value = tuple(value)
+        setattr(param, name, value)
+
+
+    return param
+def get_output_path(param:AssembleParam, input_folder_path:str, output_dir:str):
+
+    # Output is named after its input folder (Sheet & atlas are files, strips & images are folders suffixed with the mode so they never land on the input itself)
+    name = os.path.basename(os.path.normpath(input_folder_path))
+    output_dir = output_dir if output_dir else os.path.dirname(os.path.abspath(input_folder_path))
+    if(param.combine_mode in [CombineMode.SHEET, CombineMode.ATLAS]):
+        return os.path.join(output_dir, name + OUTPUT_FORMAT_EXTENSIONS.get(param.output_format, DEFAULT_OUTPUT_EXTENSION))
+
+    return os.path.join(output_dir, f"{name}_{param.combine_mode.value.lower()}")
+def assemble_folder(param:AssembleParam, input_folder_path:str, output_path:str, is_quiet:bool):  # Returns error message or None on success
+
+    # Assemble a single folder (Failures are returned rather than raised so one bad folder doesn't stop the rest)
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull if is_quiet else sys.stdout):
+            assemble_images(param, input_folder_path, output_path)
+    except Exception as e:
+        return f"{e}\n{traceback.format_exc()}"
+
+
+    return None
+def main(argv:list = None):
+
+    # Parse arguments
+    parser = argparse.ArgumentParser(prog="python -m modules.assemble_cli", description="Assemble captured frame folders into sprite sheets without Blender")
+    parser.add_argument("input_folders", nargs="+", help="Folders of captured frames (e.g. SpriteSheetMakerTemp), each one is assembled on its own")
+    parser.add_argument("-o", "--output-dir", default="", help="Folder outputs are saved in, named after their input folder (default: next to each input folder)")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Folders assembled at the same time, 0 = all CPU cores (default: %(default)s)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Only print a line per folder instead of every assembly step")
+    add_param_arguments(parser)
+    args = parser.parse_args(argv)
+    param = gen_assemble_param(args)
+
+
+    # Make sure output folder exists
+    if(args.output_dir and not os.path.exists(args.output_dir)):
+        os.makedirs(args.output_dir)
+
+
+    # Assemble folders one after another or across a process pool
+    tasks = [(param, input_folder_path, get_output_path(param, input_folder_path, args.output_dir), args.quiet) for input_folder_path in args.input_folders]
+    job_count = min(args.jobs if args.jobs > 0 else (os.cpu_count() or 1), len(tasks))
+    start_time = time.perf_counter()
+    if(job_count <= 1):
+        errors = [assemble_folder(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=job_count) as executor:
+            errors = list(executor.map(assemble_folder, *zip(*tasks)))
+
+
+    # Report every folder & fail if any of them did
+    failed_count = 0
+    for (_, input_folder_path, output_path, _), error in zip(tasks, errors):
+        if error is None:
+            print(f"Assembled '{input_folder_path}' into '{output_path}'")
+        else:
+            failed_count += 1
+            print(f"Failed to assemble '{input_folder_path}': {error}", file=sys.stderr)
+    print(f"Assembled {len(tasks) - failed_count} of {len(tasks)} folders in {time.perf_counter() - start_time:.3f}s")
+    return 1 if failed_count != 0 else 0
+
+
+# Main
+if __name__ == "__main__":
+    sys.exit(main())
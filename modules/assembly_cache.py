@@ -0,0 +1,108 @@
+import os
+import json
+import zlib
+import hashlib
+
+
+# Constants
+CACHE_FOLDER_NAME = ".ssm_cache"  # Kept inside the input folder so it goes away along with it
+CACHE_VERSION = 1  # Bump whenever cached data or keys change meaning so old caches are ignored
+MANIFEST_FILE_NAME = "manifest.json"
+BAND_FILE_EXTENSION = ".band"
+BAND_COMPRESS_LEVEL = 1  # Bands are mostly transparent so even the fastest level shrinks them a lot
+HASH_CHUNK_SIZE = 1 << 20
+
+
+# Classes
+class AssemblyCache:
+    def __init__(self, input_folder_path:str):
+        self.folder_path = os.path.join(input_folder_path, CACHE_FOLDER_NAME)
+        self.input_folder_path = input_folder_path
+        self.file_hashes = {}  # { relative frame path: [mtime_ns, size, hash] }
+        self.used_band_paths = set()
+
+
+        # Load manifest of previous run (Ignored if missing, unreadable or from another cache version)
+        manifest_path = os.path.join(self.folder_path, MANIFEST_FILE_NAME)
+        if os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, 'r') as file:
+                    manifest = json.load(file)
+                if manifest.get("version") == CACHE_VERSION:
+                    self.file_hashes = manifest.get("frames", {})
+            except (OSError, ValueError):
+                self.file_hashes = {}
+    def hash_file(self, file_path:str):
+
+        # Reuse hash if file is untouched since the previous run (Only changed files are read again)
+        stat = os.stat(file_path)
+        rel_path = os.path.relpath(file_path, self.input_folder_path)
+        cached = self.file_hashes.get(rel_path)
+        if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+
+
+        # Hash file contents
+        self.file_hashes[rel_path] = [stat.st_mtime_ns, stat.st_size, calc_file_hash(file_path)]
+        return self.file_hashes[rel_path][2]
+    def add_known_hash(self, file_path:str, mtime_ns:int, size:int, file_hash:str):
+
+        # Use hash calculated elsewhere (e.g. frame manifest) unless a previous run already hashed the file, still only trusted while mtime & size match
+        rel_path = os.path.relpath(file_path, self.input_folder_path)
+        self.file_hashes.setdefault(rel_path, [mtime_ns, size, file_hash])
+    def band_path(self, band_key:str):
+
+        # Make sure folder exists (Bands may be written by worker processes before the cache is saved)
+        if not os.path.exists(self.folder_path):
+            os.makedirs(self.folder_path)
+
+
+        band_path = os.path.join(self.folder_path, band_key + BAND_FILE_EXTENSION)
+        self.used_band_paths.add(band_path)
+        return band_path
+    def save(self):
+
+        # Make sure folder exists
+        if not os.path.exists(self.folder_path):
+            os.makedirs(self.folder_path)
+
+
+        # Remove bands not used by this run (Otherwise every edit would leave a stale band behind)
+        for file_name in os.listdir(self.folder_path):
+            file_path = os.path.join(self.folder_path, file_name)
+            if file_name.endswith(BAND_FILE_EXTENSION) and file_path not in self.used_band_paths:
+                os.remove(file_path)
+
+
+        # Save manifest
+        with open(os.path.join(self.folder_path, MANIFEST_FILE_NAME), 'w') as file:
+            json.dump({ "version": CACHE_VERSION, "frames": self.file_hashes }, file)
+
+
+# Methods
+def calc_file_hash(file_path:str):
+
+    # Hash file contents in chunks so large frames are never read at once
+    file_hash = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            file_hash.update(chunk)
+
+
+    return file_hash.hexdigest()
+def calc_band_key(*parts):
+
+    # Hash everything that affects a band's pixels (repr is stable for the ints, strings & tuples passed in)
+    band_key = hashlib.blake2b(digest_size=16)
+    band_key.update(repr((CACHE_VERSION,) + parts).encode())
+    return band_key.hexdigest()
+def write_band(band_path:str, band):
+
+    # Write to a temporary file first so an interrupted write never leaves a truncated band behind
+    temp_path = band_path + ".tmp"
+    with open(temp_path, 'wb') as file:
+        file.write(zlib.compress(band.tobytes(), BAND_COMPRESS_LEVEL))
+    os.replace(temp_path, band_path)
+def read_band(band_path:str):
+    with open(band_path, 'rb') as file:
+        return zlib.decompress(file.read())
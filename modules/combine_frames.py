@@ -1,7 +1,30 @@
 import os
-from PIL import Image, ImageDraw, ImageFont
+import copy
+import json
+import math
+import time
+import hashlib
+import traceback
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from PIL import Image
 from enum import Enum
+try:
+    import numpy as np
+except ImportError:  # Only required by the NumPy composite backend
+    np = None
 from .logging import *
+from .frame_layout import *
+from .png_stream import PngStreamWriter, PNG_COLOR_TYPES
+from .label_cache import measure_label, draw_label
+from .output_encoding import *
+from .palette import to_indexed_image
+from .metadata_export import *
+from .assembly_cache import AssemblyCache, calc_band_key, write_band, read_band
+from .frame_manifest import read_frame_manifest, read_row_flip, FRAME_MANIFEST_FILE_NAME
+from .frame_prefetch import prefetch, map_threaded, is_prefetching
+from .frame_store import FrameStore, StoredFrame
 
 
 # Constants
@@ -9,40 +32,40 @@ DEFAULT_COLOR_MODE = "RGBA"
 DEFAULT_FILE_FORMAT = "PNG"
 PIL_MAX_CHANNEL_VALUE = 255
 DEFAULT_ALPHA_CHANNEL_VALUE = 255
+ATLAS_METADATA_EXTENSION = ".json"
 
 
 # Enums
-class SpriteAlign(Enum):
-    TOP_LEFT = "Top Left"
-    TOP_CENTER = "Top Center"
-    TOP_RIGHT = "Top Right"
-    MIDDLE_LEFT = "Middle Left"
-    MIDDLE_CENTER = "Middle Center"
-    MIDDLE_RIGHT = "Middle Right"
-    BOTTOM_LEFT = "Bottom Left"
-    BOTTOM_CENTER = "Bottom Center"
-    BOTTOM_RIGHT = "Bottom Right"
-class SpriteConsistency(Enum):
-    INDIVIDUAL = "Individual Consistent"
-    ROW = "Row Consistent"
-    ALL = "All Consistent"
-class CombineMode(Enum):
-    IMAGES = "Images"
-    STRIPS = "Strips"
-    SHEET = "Sheet"
+class CompositeBackend(Enum):
+    PILLOW = "Pillow"
+    NUMPY = "NumPy"
 
 
 # Classes
+class FrameData:
+    def __init__(self):
+        self.path:str = ""
+        self.width:int = 0
+        self.height:int = 0
+        self.mode:str = DEFAULT_COLOR_MODE
+        self.format:str = DEFAULT_FILE_FORMAT
+        self.source_width:int = 0  # Size of the image on disk before trimming
+        self.source_height:int = 0
+        self.trim_box:tuple[int, int, int, int] = (0, 0, 0, 0)  # left, top, right, bottom of the kept area within the source image (After flipping)
+        self.flip_h:bool = False  # Frame is flipped while loading, the file itself is never rewritten
+        self.flip_v:bool = False
+        self.content_hash:str = ""  # Hash of decoded (trimmed) pixels, only calculated when deduplicating
+        self.file_hash:str = ""  # Hash of the file on disk, only calculated for incremental assembly
+        self.scale:int = 1  # Frame is reduced by this factor when loaded (Previews only, width & height are already scaled)
+        self.stored:StoredFrame = None  # Raw pixels kept in a frame store while capturing, read instead of the file when set
 class RowData:
     def __init__(self):
+        self.name:str = "Untitled"  # Name of the row's folder, label text may have frame count & row size added
         self.label_text:str = "Untitled"
         self.label_width:int = 0
         self.label_height:int = 0
         self.label_offset:tuple[int, int] = (0, 0)
-        self.images = []
-        self.img_accum_width:int = 0  # Combined
-        self.img_widest:int = 0  # width of the widest image in the row
-        self.img_tallest:int = 0  # height of the tallest image in the row
+        self.frames:list[FrameData] = []  # Only metadata, pixels are loaded one frame at a time while pasting
 class AssembleParam:
     def __init__(self):
         self.font_size:int = 24
@@ -56,6 +79,65 @@ class AssembleParam:
         self.combine_mode:CombineMode = CombineMode.SHEET
         self.label_show_frame_count:bool = False
         self.label_show_row_size:bool = False
+        self.trim_transparent:bool = False  # Crop every frame to the bounding box of its non transparent pixels
+        self.deduplicate_frames:bool = False  # Store pixel identical frames only once (Atlas mode only)
+        self.composite_backend:CompositeBackend = CompositeBackend.PILLOW
+        self.stream_output:bool = False  # Write sheet one row band at a time straight into the png so the whole sheet is never held in memory
+        self.encoder_profile:EncoderProfile = EncoderProfile.BALANCED  # Trade off between encode speed & file size of every output
+        self.output_format:OutputFormat = OutputFormat.AUTO  # Overrides format of the output path (Or of the frames for strips & images)
+        self.indexed_output:bool = False  # Save sheet & atlas as a single palette (P mode) image, only exact if no more than 256 colors are used
+        self.metadata_format:MetadataFormat = MetadataFormat.NONE  # Engine metadata saved next to sheet & atlas
+        self.frame_rate:float = 24.0  # Used for frame durations & animation speed of exported metadata
+        self.max_columns:int = 0  # Rows of the sheet wrap onto sub rows (under a single label) after this many frames (0 = no limit)
+        self.target_aspect:float = 0.0  # Sheet width / height to aim for by picking the column count rows wrap at, capped by max columns (0 = off)
+        self.max_texture_size:int = 0  # Sheet & atlas spill onto extra pages (sheet_0.png, sheet_1.png, ...) so no page is wider or taller than this (0 = no limit)
+        self.incremental_assembly:bool = False  # Cache every row band of the sheet & only re-composite rows whose frames changed since the previous run
+        self.prefetch_depth:int = 4  # Frames decoded ahead on background threads while the current one is pasted (0 = decode one at a time while pasting)
+        self.worker_count:int = 1  # Processes used to create sheet bands, strips or images in parallel (1 = serial, 0 = all CPU cores)
+        self.preview_scale:int = 1  # Decode frames at 1/2, 1/4 or 1/8 scale & shrink the whole layout to match for a quick preview (1 = full size)
+        self.dry_run:bool = False  # Only calculate & return the layout without creating any output
+class ArrayCanvas:
+    def __init__(self, size:tuple[int, int], bg_color:tuple):
+        self.pixels = np.empty((size[1], size[0], 4), dtype=np.uint8)
+        self.pixels[:] = bg_color
+        self.is_bg_transparent = bg_color[3] == 0  # Every cell is pasted once onto untouched background, so no blending is needed
+    def paste(self, img, position:tuple[int, int]):
+
+        # Get source pixels & destination region
+        src = np.asarray(img if img.mode == DEFAULT_COLOR_MODE else img.convert(DEFAULT_COLOR_MODE))
+        x, y = position
+        dst = self.pixels[y:y + src.shape[0], x:x + src.shape[1]]
+
+
+        # Copy straight in if source has no alpha to blend
+        if img.mode != DEFAULT_COLOR_MODE:
+            dst[:] = src
+            return
+
+
+        # Copy only visible pixels over transparent background (Same result as alpha compositing onto it)
+        src_visible = src[..., 3] > 0
+        if self.is_bg_transparent:
+            np.copyto(dst, src, where=src_visible[..., None])
+            return
+
+
+        # Alpha composite using the same integer math as Pillow so both backends give identical pixels
+        src_u32 = src.astype(np.uint32)
+        dst_u32 = dst.astype(np.uint32)
+        src_alpha = src_u32[..., 3]
+        out_alpha_255 = src_alpha * 255 + dst_u32[..., 3] * (255 - src_alpha)
+        coef1 = np.zeros_like(src_alpha)
+        coef1[src_visible] = (src_alpha[src_visible] * 255 * 255 * 128) // out_alpha_255[src_visible]
+        coef2 = 255 * 128 - coef1
+        rgb = src_u32[..., :3] * coef1[..., None] + dst_u32[..., :3] * coef2[..., None] + (0x80 << 7)
+        rgb = ((((rgb >> 8) + rgb) >> 8) >> 7)
+        alpha = out_alpha_255 + 0x80
+        alpha = ((alpha >> 8) + alpha) >> 8
+        out = np.concatenate([rgb, alpha[..., None]], axis=-1).astype(np.uint8)
+        np.copyto(dst, out, where=src_visible[..., None])
+    def to_image(self):
+        return Image.fromarray(self.pixels, DEFAULT_COLOR_MODE)
 
 
 # Methods
@@ -67,16 +149,26 @@ def flip_image(image_path:str, flip_h:bool, flip_v:bool):
         return
 
 
+    # Flip and save back to same path
+    img = flip_pixels(Image.open(image_path), flip_h, flip_v)
+    img.save(image_path)
+def flip_pixels(img, flip_h:bool, flip_v:bool):
+
     # Flip horizontally and or vertically based on given flags
-    img = Image.open(image_path)
     if(flip_h):
         img = img.transpose(Image.FLIP_LEFT_RIGHT)
     if(flip_v):
         img = img.transpose(Image.FLIP_TOP_BOTTOM)
+    return img
+def mirror_box(box:tuple[int, int, int, int], width:int, height:int, flip_h:bool, flip_v:bool):
 
-
-    # Save flipped image back to same path
-    img.save(image_path)
+    # Mirror box within an image of given size (Mirroring twice gives back the original box)
+    left, top, right, bottom = box
+    if(flip_h):
+        left, right = width - right, width - left
+    if(flip_v):
+        top, bottom = height - bottom, height - top
+    return (left, top, right, bottom)
 def unique_path(target_path:str, count_limit:int = 100000):
 
     # Return if path already doesn't exists
@@ -111,6 +203,98 @@ def create_folder(at_path, folder_name=""):
 
 
     return folder_path
+def get_stored_frame(frame_store:FrameStore, frame_path:str):
+    return frame_store.get(frame_path) if frame_store is not None else None
+def open_frame(frame_path:str, stored:StoredFrame = None):
+
+    # Wrap stored raw pixels if there are any, otherwise open the file (Lazily, so only the header is read until pixels are needed)
+    return stored.to_image() if stored is not None else Image.open(frame_path)
+def read_frame_data(image_path:str, trim_transparent:bool = False, calc_hash:bool = False, stored:StoredFrame = None, flip_h:bool = False, flip_v:bool = False):
+
+    # Read only the header (Pillow opens lazily so pixel data is only decoded when trimming)
+    frame = FrameData()
+    frame.path = image_path
+    frame.stored = stored
+    frame.flip_h = flip_h
+    frame.flip_v = flip_v
+    with open_frame(image_path, stored) as img:
+        frame.source_width, frame.source_height = img.size
+        frame.mode = img.mode
+        img_format = img.format if stored is None else stored.format
+        frame.format = img_format if img_format is not None else DEFAULT_FILE_FORMAT
+        frame.trim_box = (0, 0, frame.source_width, frame.source_height)
+
+
+        # Find bounding box of non transparent pixels (Fallback to a single pixel if the frame is completely transparent), mirrored to where it ends up once flipped
+        source_box = frame.trim_box
+        if(trim_transparent and img.mode == DEFAULT_COLOR_MODE):
+            alpha_bbox = img.getchannel("A").getbbox()
+            source_box = alpha_bbox if alpha_bbox is not None else (0, 0, 1, 1)
+            frame.trim_box = mirror_box(source_box, frame.source_width, frame.source_height, flip_h, flip_v)
+
+
+        # Hash decoded pixels of kept area as they're pasted (Mode & size included so equal bytes of different shapes never match)
+        if(calc_hash):
+            pixels = flip_pixels(img.crop(source_box), flip_h, flip_v).tobytes()
+            content_hash = hashlib.blake2b(digest_size=16)
+            content_hash.update(f"{frame.mode}:{frame.trim_box[2] - frame.trim_box[0]}x{frame.trim_box[3] - frame.trim_box[1]}:".encode())
+            content_hash.update(pixels)
+            frame.content_hash = content_hash.hexdigest()
+
+
+    frame.width = frame.trim_box[2] - frame.trim_box[0]
+    frame.height = frame.trim_box[3] - frame.trim_box[1]
+    return frame
+def load_frame(frame:FrameData):
+
+    # Open frame & make sure it's still the size it was laid out with (Frame may have been edited after a manifest was written)
+    img = open_frame(frame.path, frame.stored)
+    if(img.size != (frame.source_width, frame.source_height)):
+        img.close()
+        raise Exception(f"Frame '{frame.path}' is no longer {frame.source_width}x{frame.source_height}, it was edited after '{FRAME_MANIFEST_FILE_NAME}' was written so the manifest no longer matches the folder")
+
+
+    # Return as is if there's nothing to crop, scale or flip (Still lazy so pixels are only decoded while pasting)
+    is_trimmed = frame.trim_box != (0, 0, frame.source_width, frame.source_height)
+    is_flipped = frame.flip_h or frame.flip_v
+    if(not is_trimmed and frame.scale == 1 and not is_flipped):
+        return img
+
+
+    # Let decoders that support it (JPEG) decode straight at a reduced scale, whatever is left is reduced after cropping
+    draft_scale = 1
+    if(frame.scale > 1):
+        img.draft(img.mode, (math.ceil(frame.source_width / frame.scale), math.ceil(frame.source_height / frame.scale)))
+        draft_scale = max(1, round(frame.source_width / img.width))
+
+
+    # Crop frame down to its trimmed area (Trim box is mirrored back since the file itself isn't flipped)
+    frame_img = img
+    if(is_trimmed):
+        left, top, right, bottom = mirror_box(frame.trim_box, frame.source_width, frame.source_height, frame.flip_h, frame.flip_v)
+        frame_img = img.crop((left // draft_scale, top // draft_scale, math.ceil(right / draft_scale), math.ceil(bottom / draft_scale)))
+
+
+    # Flip before reducing so partial edge blocks end up where they would if the file itself was flipped
+    frame_img = flip_pixels(frame_img, frame.flip_h, frame.flip_v)
+
+
+    # Reduce to preview scale (Resized only if draft rounding left it a pixel off from the layout)
+    if(frame.scale // draft_scale > 1):
+        frame_img = frame_img.reduce(frame.scale // draft_scale)
+    if(frame_img.size != (frame.width, frame.height)):
+        frame_img = frame_img.resize((frame.width, frame.height))
+    if(frame_img is not img):
+        img.close()
+
+
+    return frame_img
+def decode_frame(frame:FrameData):
+
+    # Load & decode pixels right away (Used when prefetching so decoding happens on a background thread rather than while pasting)
+    img = load_frame(frame)
+    img.load()
+    return img
 def color_to_pil(color, mode):
 
     # Warn and fallback if color data is invalid
@@ -143,353 +327,678 @@ def alpha_paste(base_img, src_img, position):
 
     # Properly alpha composite source onto base at given position
     base_img.alpha_composite(src_img, dest=position)
-def calc_align_offset(align:SpriteAlign, large_width:int, large_height:int, small_width:int, small_height:int):
-
-    x_offset = 0.0
-    y_offset = 0.0
-
-
-    # Get X Offset
-    if(align in [SpriteAlign.TOP_LEFT, SpriteAlign.MIDDLE_LEFT, SpriteAlign.BOTTOM_LEFT]):
-        x_offset = 0.0
-    elif(align in [SpriteAlign.TOP_CENTER, SpriteAlign.MIDDLE_CENTER, SpriteAlign.BOTTOM_CENTER]):
-        x_offset = (large_width - small_width) / 2.0
-    elif(align in [SpriteAlign.TOP_RIGHT, SpriteAlign.MIDDLE_RIGHT, SpriteAlign.BOTTOM_RIGHT]):
-        x_offset = (large_width - small_width)
-    
-
-    # Get Y Offset
-    if(align in [SpriteAlign.TOP_LEFT, SpriteAlign.TOP_CENTER, SpriteAlign.TOP_RIGHT]):
-        y_offset = 0.0
-    elif(align in [SpriteAlign.MIDDLE_LEFT, SpriteAlign.MIDDLE_CENTER, SpriteAlign.MIDDLE_RIGHT]):
-        y_offset = (large_height - small_height) / 2.0
-    elif(align in [SpriteAlign.BOTTOM_LEFT, SpriteAlign.BOTTOM_CENTER, SpriteAlign.BOTTOM_RIGHT]):
-        y_offset = (large_height - small_height)
-
-
-    return int(x_offset), int(y_offset)
-def calc_row_size(param:AssembleParam, row_data:RowData, global_img_widest:int, global_img_tallest:int):
-
-    # Get essentials
-    img_count = len(row_data.images)
-    gaps = param.image_margin * (img_count - 1)
-
-
-    # Calculate row width & height
-    if(param.consistency == SpriteConsistency.INDIVIDUAL):
-        row_width = row_data.img_accum_width + gaps
-        row_height = row_data.img_tallest
-    elif(param.consistency == SpriteConsistency.ROW):
-        row_width = (row_data.img_widest * img_count) + gaps
-        row_height = row_data.img_tallest
-    elif(param.consistency == SpriteConsistency.ALL):
-        row_width = (global_img_widest * img_count) + gaps
-        row_height = global_img_tallest
-
-
-    return int(row_width), int(row_height)
-def combine_into_sheet(param:AssembleParam, rows:list[RowData], global_img_widest:int, global_img_tallest:int, output_path:str):
-
-    # Extract from param
-    surrounding_margin = param.surrounding_margin
-    label_margin = param.label_margin
-    image_margin = param.image_margin
-    font_size = param.font_size
-
-
-    # Calculate sheet dimensions based on sprite consistency
-    sheet_width = 0
-    sheet_height = 0
-    for row_count, row_data in enumerate(rows):
+def create_canvas(param:AssembleParam, img_mode:str, size:tuple[int, int], bg_color:tuple):
+
+    # Use array canvas only when requested & possible
+    if(param.composite_backend == CompositeBackend.NUMPY):
+        if(np is None):
+            log("NumPy is not installed, falling back to Pillow composite backend")
+        elif(img_mode != DEFAULT_COLOR_MODE):
+            log(f"NumPy composite backend only supports {DEFAULT_COLOR_MODE}, falling back to Pillow for '{img_mode}'")
+        else:
+            return ArrayCanvas(size, bg_color)
+
+
+    return Image.new(img_mode, size, bg_color)
+def paste_onto_canvas(canvas, img, position:tuple[int, int]):
+    if isinstance(canvas, ArrayCanvas):
+        canvas.paste(img, position)
+    else:
+        alpha_paste(canvas, img, position)
+def canvas_to_image(canvas):
+    return canvas.to_image() if isinstance(canvas, ArrayCanvas) else canvas
+def calc_sheet_bands(row_tops:list[int], sheet_height:int):
+
+    # Split sheet into horizontal bands at row boundaries (First & last band also cover the surrounding margins)
+    bands = []  # [(band_top, band_height), ...]
+    for i in range(len(row_tops)):
+        band_top = 0 if i == 0 else row_tops[i]
+        band_bottom = row_tops[i + 1] if i + 1 < len(row_tops) else sheet_height
+        bands.append((band_top, band_bottom - band_top))
+
+
+    return bands
+def calc_page_bands(layout:FrameLayout, canvas_index:int):
+
+    # Split a single page of the sheet into one band per row (or part of a row split across pages) it holds
+    first_band, last_band = layout.canvas_rows[canvas_index], layout.canvas_rows[canvas_index + 1]
+    bands = calc_sheet_bands(layout.row_tops[first_band:last_band], layout.canvas(canvas_index)[1])
+    return [(first_band + i, band_top, band_height) for i, (band_top, band_height) in enumerate(bands)]
+def calc_page_path(output_path:str, page_index:int, page_count:int):
+
+    # Single page keeps the given path, otherwise every page gets its index appended (sheet_0.png, sheet_1.png, ...)
+    if(page_count <= 1):
+        return output_path
+
+    base_path, ext = os.path.splitext(output_path)
+    return f"{base_path}_{page_index}{ext}"
+def get_cell_frames(layout:FrameLayout, frames:list[FrameData], first_cell:int, last_cell:int):
+    return [frames[layout.cells[i * CELL_STRIDE + 1]] for i in range(first_cell, last_cell)]
+def get_labels(layout:FrameLayout, rows:list[RowData], canvas_index:int, first_row:int, last_row:int):
+
+    # Get text & location of every label on given canvas within the given rows
+    labels = []  # [(label_text, x, y), ...]
+    for i in range(layout.label_count):
+        label_canvas, row_index, x, y = layout.label(i)
+        if label_canvas == canvas_index and first_row <= row_index < last_row:
+            labels.append((rows[row_index].label_text, x, y))
+
+
+    return labels
+def get_canvas_content(layout:FrameLayout, rows:list[RowData], frames:list[FrameData], canvas_index:int):
+
+    # Get cells, frames & labels of a single canvas (Only what's needed so it's cheap to send to a worker process)
+    first_cell, last_cell = layout.canvas_cells[canvas_index], layout.canvas_cells[canvas_index + 1]
+    cells = layout.cells[first_cell * CELL_STRIDE:last_cell * CELL_STRIDE]
+    return cells, get_cell_frames(layout, frames, first_cell, last_cell), get_labels(layout, rows, canvas_index, 0, len(rows))
+def get_band_content(layout:FrameLayout, rows:list[RowData], frames:list[FrameData], canvas_index:int, first_band:int, last_band:int):
+
+    # Get cells, frames & labels of the given row bands of a sheet page (A row has at most one band on every page)
+    first_cell, last_cell = layout.row_cells[first_band], layout.row_cells[last_band]
+    cells = layout.cells[first_cell * CELL_STRIDE:last_cell * CELL_STRIDE]
+    return cells, get_cell_frames(layout, frames, first_cell, last_cell), get_labels(layout, rows, canvas_index, layout.band_rows[first_band], layout.band_rows[last_band - 1] + 1)
+def compose_canvas(param:AssembleParam, img_mode:str, size:tuple[int, int], top:int, cells:array, frames:list[FrameData], labels:list):
+
+    # Create canvas (Everything is pasted relative to top so a horizontal band of a canvas can be composed on its own)
+    bg_color = color_to_pil(param.background_color, img_mode)
+    canvas = create_canvas(param, img_mode, size, bg_color)
+
+
+    # Paste images (Closed right away so only the current frame & the ones being prefetched are held in memory)
+    frame_loader = decode_frame if is_prefetching(param.prefetch_depth, len(frames)) else load_frame
+    for i, img in enumerate(prefetch(frames, frame_loader, param.prefetch_depth)):
+        paste_x = cells[i * CELL_STRIDE + 6]
+        paste_y = cells[i * CELL_STRIDE + 7]
+        with img:
+            paste_onto_canvas(canvas, img, (paste_x, paste_y - top))
+        log(f"Addded image of frame {i + 1} at ({paste_x},{paste_y})")
+
+
+    # Paste labels (Drawn once all images are pasted since they never overlap)
+    image = canvas_to_image(canvas)
+    label_fill = color_to_pil(param.label_color, img_mode)
+    for label_text, label_location_x, label_location_y in labels:
+        draw_label(image, label_text, param.font_size, (label_location_x, label_location_y - top), label_fill)
+        log(f"Addded label '{label_text}' at ({label_location_x},{label_location_y})")
+
+
+    return image
+def compose_sheet_band_shared(shm_name:str, row_bytes:int, param:AssembleParam, img_mode:str, sheet_width:int, band_top:int, band_height:int, cells:array, frames:list[FrameData], labels:list):
+
+    # Compose band & copy its pixels into its rows of the shared sheet buffer
+    band = compose_canvas(param, img_mode, (sheet_width, band_height), band_top, cells, frames, labels)
+    shm = SharedMemory(name=shm_name)
+    try:
+        shm.buf[band_top * row_bytes:(band_top + band_height) * row_bytes] = band.tobytes()
+    finally:
+        shm.close()
+def combine_into_sheet_parallel(param:AssembleParam, rows:list[RowData], frames:list[FrameData], layout:FrameLayout, canvas_index:int, img_mode:str, output_path:str):
+
+    # Allocate the sheet once in shared memory so workers write their bands in place
+    sheet_width, sheet_height = layout.canvas(canvas_index)
+    row_bytes = len(Image.new(img_mode, (sheet_width, 1)).tobytes())
+    shm = SharedMemory(create=True, size=max(1, row_bytes * sheet_height))
+    try:
+
+        # Compose one band per row band
+        tasks = []
+        for i, band_top, band_height in calc_page_bands(layout, canvas_index):
+            args = (shm.name, row_bytes, param, img_mode, sheet_width, band_top, band_height, *get_band_content(layout, rows, frames, canvas_index, i, i + 1))
+            tasks.append((rows[layout.band_rows[i]].label_text, compose_sheet_band_shared, args))
+
+
+        # Compose all bands
+        run_row_tasks(param, tasks)
+
+
+        # Encode once from the shared buffer (Image is released before the buffer is closed, even if saving fails)
+        sheet = Image.frombuffer(img_mode, (sheet_width, sheet_height), shm.buf, "raw", img_mode, 0, 1)
+        try:
+            log(f"Saving sprite sheet to '{output_path}' ...")
+            save_combined_image(param, sheet, output_path)
+        finally:
+            sheet.close()
+            del sheet
+    finally:
+        try:
+            shm.close()
+        finally:
+            shm.unlink()
+def save_combined_image(param:AssembleParam, image, output_path:str):
+
+    # Convert to a single shared palette if requested (Saved as is if that isn't possible)
+    if(param.indexed_output):
+        indexed_image = to_indexed_image(image)
+        if(indexed_image is not None):
+            image = indexed_image
+
+
+    save_image(image, output_path, param.encoder_profile)
+def can_stream_sheet(param:AssembleParam, img_mode:str, output_path:str):
+
+    # Return if streaming isn't requested
+    if(not param.stream_output):
+        return False
+
+
+    # Streaming needs 8 bit png output (Indexed output needs every pixel before its palette can be built)
+    is_png = os.path.splitext(output_path)[1].lower() == ".png"
+    if(not is_png or img_mode not in PNG_COLOR_TYPES):
+        log("Streamed output only supports 8 bit png, creating sheet in memory instead")
+        return False
+    if(param.indexed_output):
+        log("Streamed output does not support indexed output, creating sheet in memory instead")
+        return False
+
+
+    return True
+def create_png_stream(param:AssembleParam, output_path:str, width:int, height:int, img_mode:str):
+    compress_level, compress_strategy = STREAM_COMPRESS_OPTIONS[param.encoder_profile]
+    return PngStreamWriter(output_path, width, height, img_mode, compress_level, compress_strategy)
+def combine_into_sheet_streamed(param:AssembleParam, rows:list[RowData], frames:list[FrameData], layout:FrameLayout, canvas_index:int, img_mode:str, output_path:str):
+
+    # Compose one row band at a time and write it straight into the png (Only a single band is ever held in memory)
+    sheet_width, sheet_height = layout.canvas(canvas_index)
+    log(f"Streaming sprite sheet to '{output_path}' ...")
+    start_time = time.perf_counter()
+    with create_png_stream(param, output_path, sheet_width, sheet_height, img_mode) as writer:
+        for i, band_top, band_height in calc_page_bands(layout, canvas_index):
+            band = compose_canvas(param, img_mode, (sheet_width, band_height), band_top, *get_band_content(layout, rows, frames, canvas_index, i, i + 1))
+            writer.write_band(band)
+            del band
+    log(f"Composed & encoded '{os.path.basename(output_path)}' with {param.encoder_profile.value} profile in {time.perf_counter() - start_time:.3f}s ({os.path.getsize(output_path)} bytes)")
+def calc_sheet_band_key(param:AssembleParam, img_mode:str, sheet_width:int, band_top:int, band_height:int, cells:array, frames:list[FrameData], labels:list):
+
+    # Positions are taken relative to band top so a band only changes when its own row does
+    cell_keys = []
+    for i, frame in enumerate(frames):
+        paste_x = cells[i * CELL_STRIDE + 6]
+        paste_y = cells[i * CELL_STRIDE + 7]
+        cell_keys.append((frame.file_hash, tuple(frame.trim_box), frame.flip_h, frame.flip_v, paste_x, paste_y - band_top))
+    label_keys = [(label_text, x, y - band_top) for label_text, x, y in labels]
+    colors = (tuple(param.background_color), tuple(param.label_color), param.font_size)
+    return calc_band_key(img_mode, sheet_width, band_height, colors, tuple(cell_keys), tuple(label_keys))
+def cache_sheet_band(band_path:str, param:AssembleParam, img_mode:str, sheet_width:int, band_top:int, band_height:int, cells:array, frames:list[FrameData], labels:list):
+    band = compose_canvas(param, img_mode, (sheet_width, band_height), band_top, cells, frames, labels)
+    write_band(band_path, band)
+def combine_into_sheet_incremental(param:AssembleParam, rows:list[RowData], frames:list[FrameData], layout:FrameLayout, canvas_index:int, img_mode:str, output_path:str, cache:AssemblyCache):
+
+    # Collect a task for every band not cached by a previous run
+    sheet_width, sheet_height = layout.canvas(canvas_index)
+    bands = calc_page_bands(layout, canvas_index)
+    band_paths = []
+    tasks = []
+    for i, band_top, band_height in bands:
+        content = get_band_content(layout, rows, frames, canvas_index, i, i + 1)
+        band_path = cache.band_path(calc_sheet_band_key(param, img_mode, sheet_width, band_top, band_height, *content))
+        band_paths.append(band_path)
+        if not os.path.exists(band_path):
+            tasks.append((rows[layout.band_rows[i]].label_text, cache_sheet_band, (band_path, param, img_mode, sheet_width, band_top, band_height, *content)))
+
+
+    # Re-composite changed bands only
+    log(f"Reusing {len(bands) - len(tasks)} of {len(bands)} cached row bands, re-compositing {len(tasks)}")
+    run_row_tasks(param, tasks)
+
+
+    # Write bands into the png one at a time if streaming, otherwise into the whole sheet
+    if(can_stream_sheet(param, img_mode, output_path)):
+        log(f"Streaming sprite sheet to '{output_path}' ...")
+        start_time = time.perf_counter()
+        with create_png_stream(param, output_path, sheet_width, sheet_height, img_mode) as writer:
+            for band_path, (_, band_top, band_height) in zip(band_paths, bands):
+                writer.write_band(Image.frombytes(img_mode, (sheet_width, band_height), read_band(band_path)))
+        log(f"Encoded '{os.path.basename(output_path)}' with {param.encoder_profile.value} profile in {time.perf_counter() - start_time:.3f}s ({os.path.getsize(output_path)} bytes)")
+    else:
+        sheet = Image.new(img_mode, (sheet_width, sheet_height))
+        for band_path, (_, band_top, band_height) in zip(band_paths, bands):
+            sheet.paste(Image.frombytes(img_mode, (sheet_width, band_height), read_band(band_path)), (0, band_top))
+        log(f"Saving sprite sheet to '{output_path}' ...")
+        save_combined_image(param, sheet, output_path)
+def combine_into_sheet_page(param:AssembleParam, rows:list[RowData], frames:list[FrameData], layout:FrameLayout, canvas_index:int, img_mode:str, output_path:str, cache:AssemblyCache = None):
+
+    # Get page dimensions
+    sheet_width, sheet_height = layout.canvas(canvas_index)
+    page_band_count = layout.canvas_rows[canvas_index + 1] - layout.canvas_rows[canvas_index]
+    log(f"Creating sprite sheet {sheet_width}x{sheet_height}")
 
-        # Calculate row height & width
-        row_width, row_height = calc_row_size(param, row_data, global_img_widest, global_img_tallest)
 
+    # Reuse cached bands of unchanged rows if possible
+    if(cache is not None and page_band_count != 0):
+        combine_into_sheet_incremental(param, rows, frames, layout, canvas_index, img_mode, output_path, cache)
+        log(f"Successfully saved sprite sheet to {output_path}")
+        return
 
-        # Add to height & width
-        sheet_width = max(sheet_width, row_width, row_data.label_width)
-        sheet_height += row_height + ((row_data.label_height + label_margin) if font_size!=0 else 0)
 
+    # Stream bands straight into the png if requested & possible
+    if(can_stream_sheet(param, img_mode, output_path) and page_band_count != 0):
+        combine_into_sheet_streamed(param, rows, frames, layout, canvas_index, img_mode, output_path)
+        log(f"Successfully saved sprite sheet to {output_path}")
+        return
 
-        # Additional top label margin 
-        if(row_count != 0):
-            sheet_height += label_margin
 
+    # Compose bands in parallel if more than one worker is requested
+    if(param.worker_count != 1 and page_band_count > 1):
+        combine_into_sheet_parallel(param, rows, frames, layout, canvas_index, img_mode, output_path)
+        log(f"Successfully saved sprite sheet to {output_path}")
+        return
 
-    # Add margins to sheet dimensions
-    sheet_width += surrounding_margin[1] + surrounding_margin[3]
-    sheet_height += surrounding_margin[0] + surrounding_margin[2]
 
+    # Create whole sheet as a single band
+    sheet = compose_canvas(param, img_mode, (sheet_width, sheet_height), 0, *get_canvas_content(layout, rows, frames, canvas_index))
 
-    # Create sheet
-    log(f"Creating sprite sheet {sheet_width}x{sheet_height}")
-    images = rows[0].images
-    img_mode = images[0].mode if len(images)!=0 else DEFAULT_COLOR_MODE
-    bg_color = color_to_pil(param.background_color, img_mode)
-    sheet = Image.new(img_mode, (int(sheet_width), int(sheet_height)), bg_color)
-    draw = ImageDraw.Draw(sheet)
-    font = ImageFont.load_default(param.font_size) if param.font_size !=0 else None
-
-
-    # Paste labels & images into sheet
-    paste_height = surrounding_margin[0]
-    for row_data in rows:
-
-        # Reset paste width
-        paste_width = surrounding_margin[3]
-
-
-        # Paste label
-        if(font_size != 0):
-            label_location_x = paste_width + row_data.label_offset[0]
-            label_location_y = paste_height + row_data.label_offset[1]
-            label_fill = color_to_pil(param.label_color, img_mode)
-            draw.text((label_location_x, label_location_y), row_data.label_text, fill=label_fill, font=font, spacing = 0)
-            paste_height += row_data.label_height + label_margin
-            log(f"Addded label '{row_data.label_text}' at ({label_location_x},{label_location_y})")
-
-
-        # Paste images
-        for i, img in enumerate(row_data.images):
-            
-            # Get cell size
-            large_width, large_height = img.width, row_data.img_tallest
-            if(param.consistency == SpriteConsistency.ROW):
-                large_width, large_height = row_data.img_widest, row_data.img_tallest
-            elif(param.consistency == SpriteConsistency.ALL):
-                large_width, large_height = global_img_widest, global_img_tallest
-            
-
-            # Calculate offset based on alignment & consistency
-            offset_x, offset_y = calc_align_offset(param.align, large_width, large_height, img.width, img.height)
-
-
-            # Paste image
-            img_location_x = paste_width + offset_x
-            img_location_y = paste_height + offset_y
-            alpha_paste(sheet, img, (int(img_location_x), int(img_location_y)))
-            paste_width += large_width + image_margin
-            log(f"Addded image of frame {i + 1} at ({img_location_x},{img_location_y})")
-
-        
-
-        # Increase paste height
-        if(param.consistency == SpriteConsistency.INDIVIDUAL):
-            paste_height += row_data.img_tallest + label_margin
-        elif(param.consistency == SpriteConsistency.ROW):
-            paste_height += row_data.img_tallest + label_margin
-        elif(param.consistency == SpriteConsistency.ALL):
-            paste_height += global_img_tallest + label_margin
-        
 
     # Save the final output sprite sheet
     log(f"Saving sprite sheet to '{output_path}' ...")
-    sheet.save(output_path)
+    save_combined_image(param, sheet, output_path)
     log(f"Successfully saved sprite sheet to {output_path}")
-def combine_into_strips(param:AssembleParam, rows:list[RowData], global_img_widest:int, global_img_tallest:int, output_path:str):
-    
-    # Extract from param
-    surrounding_margin_top = param.surrounding_margin[0]
-    surrounding_margin_right = param.surrounding_margin[1]
-    surrounding_margin_bottom = param.surrounding_margin[2]
-    surrounding_margin_left = param.surrounding_margin[3]
-    label_margin = param.label_margin
-    image_margin = param.image_margin
-    font_size = param.font_size
+def combine_into_sheet(param:AssembleParam, rows:list[RowData], frames:list[FrameData], layout:FrameLayout, output_path:str, cache:AssemblyCache = None):
+
+    # Create every page of the sheet (Only one unless a max texture size is set)
+    img_mode = frames[0].mode if len(frames)!=0 else DEFAULT_COLOR_MODE
+    page_count = layout.canvas_count
+    if(page_count > 1):
+        log(f"Splitting sprite sheet across {page_count} pages of at most {param.max_texture_size}px")
+    for canvas_index in range(page_count):
+        combine_into_sheet_page(param, rows, frames, layout, canvas_index, img_mode, calc_page_path(output_path, canvas_index, page_count), cache)
+
+
+    # Save manifest & drop bands of the previous run that weren't reused (Only once every page is done since pages share the cache)
+    if(cache is not None and len(rows) != 0):
+        cache.save()
+def create_canvas_output(param:AssembleParam, output_name:str, img_mode:str, size:tuple[int, int], cells:array, frames:list[FrameData], labels:list, output_path:str):
+
+    # Compose a whole canvas & save it (Used for strips & images which are each their own file)
+    log(f"Creating {output_name} {size[0]}x{size[1]}")
+    output_img = compose_canvas(param, img_mode, size, 0, cells, frames, labels)
+    log(f"Saving {output_name} to '{output_path}' ...")
+    save_image(output_img, output_path, param.encoder_profile)
+    log(f"Successfully saved sprite {output_name} to {output_path}")
+def run_row_task(row_label:str, task, *args):
+
+    # Attach row label to any failure so it is identifiable when raised from a worker process
+    try:
+        task(*args)
+    except Exception as e:
+        raise Exception(f"Failed to create output for row '{row_label}': {e}\n{traceback.format_exc()}")
+def run_row_tasks(param:AssembleParam, tasks:list):  # tasks = [(row_label, task, args), ...]
+
+    # Run serially unless more than one worker is requested
+    worker_count = param.worker_count if param.worker_count > 0 else (os.cpu_count() or 1)
+    worker_count = min(worker_count, len(tasks))
+    if(worker_count <= 1):
+        for row_label, task, args in tasks:
+            run_row_task(row_label, task, *args)
+        return
 
 
-    # Create font
-    font = ImageFont.load_default(param.font_size) if param.font_size !=0 else None
+    # Fan out tasks across a process pool (Results are awaited in submission order so the first failure is raised)
+    log(f"Running {len(tasks)} tasks across {worker_count} worker processes")
+    with ProcessPoolExecutor(max_workers=worker_count) as executor:
+        futures = [executor.submit(run_row_task, row_label, task, *args) for row_label, task, args in tasks]
+        for future in futures:
+            future.result()
+def combine_into_strips(param:AssembleParam, rows:list[RowData], frames:list[FrameData], layout:FrameLayout, output_path:str):
 
-    
-    # Make sure folder exists
-    create_folder(output_path)
+    # Make sure folder exists (Written into as is, so re-runs onto a fixed path like previews overwrite their strips)
+    os.makedirs(output_path, exist_ok=True)
 
 
-    # Iterate and create strips
-    for _, row_data in enumerate(rows):
-        row_width, img_height = calc_row_size(param, row_data, global_img_widest, global_img_tallest)
+    # Collect a task for every strip (Every row is its own canvas)
+    tasks = []
+    for row_count, row_data in enumerate(rows):
+        img_mode = row_data.frames[0].mode if len(row_data.frames)!=0 else DEFAULT_COLOR_MODE
+        ext = row_data.frames[0].format if len(row_data.frames) != 0 else DEFAULT_FILE_FORMAT
+        strip_output_path = apply_output_format(param.output_format, os.path.join(output_path, f"{row_data.label_text}.{ext.lower()}"))
+        cells, cell_frames, labels = get_canvas_content(layout, rows, frames, row_count)
+        tasks.append((row_data.label_text, create_canvas_output, (param, "strip", img_mode, layout.canvas(row_count), cells, cell_frames, labels, strip_output_path)))
 
-    
-        # Assign strip height & width
-        strip_width = surrounding_margin_left + max(row_width, row_data.label_width) + surrounding_margin_right
-        strip_height = surrounding_margin_top + ((row_data.label_height + label_margin) if font_size != 0 else 0) + img_height + surrounding_margin_bottom
-
-
-        # Create strip
-        log(f"Creating strip {strip_width}x{strip_height}")
-        img_mode = row_data.images[0].mode if len(row_data.images)!=0 else DEFAULT_COLOR_MODE
-        bg_color = color_to_pil(param.background_color, img_mode)
-        strip = Image.new(img_mode, (int(strip_width), int(strip_height)), bg_color)
-        draw = ImageDraw.Draw(strip)
-
-
-        # Paste label
-        paste_height = surrounding_margin_top
-        if(font_size != 0):
-            label_location_x = surrounding_margin_left + row_data.label_offset[0]
-            label_location_y = surrounding_margin_top + row_data.label_offset[1]
-            label_fill = color_to_pil(param.label_color, img_mode)
-            draw.text((label_location_x, label_location_y), row_data.label_text, fill=label_fill, font=font, spacing = 0)
-            paste_height += row_data.label_height + label_margin
-
-
-        # Paste images
-        paste_width = surrounding_margin_left
-        for img in row_data.images:
-            
-            # Get cell size
-            large_width, large_height = img.width, row_data.img_tallest
-            if(param.consistency == SpriteConsistency.ROW):
-                large_width, large_height = row_data.img_widest, row_data.img_tallest
-            elif(param.consistency == SpriteConsistency.ALL):
-                large_width, large_height = global_img_widest, global_img_tallest
-            
-
-            # Calculate offset based on alignment & consistency
-            offset_x, offset_y = calc_align_offset(param.align, large_width, large_height, img.width, img.height)
-
-
-            # Paste image
-            img_location_x = paste_width + offset_x
-            img_location_y = paste_height + offset_y
-            alpha_paste(strip, img, (int(img_location_x), int(img_location_y)))
-            paste_width += large_width + image_margin
-
-
-        # Save strip
-        ext = row_data.images[0].format if len(row_data.images) != 0 else DEFAULT_FILE_FORMAT
-        strip_output_path = os.path.join(output_path, f"{row_data.label_text}.{ext.lower()}")
-        log(f"Saving strip to '{strip_output_path}' ...")
-        strip.save(strip_output_path)
-        log(f"Successfully saved sprite strip to {strip_output_path}")
-def combine_into_images(param:AssembleParam, rows:list[RowData], global_img_widest:int, global_img_tallest:int, output_path:str):
-    
-    # Extract from param
-    surrounding_margin_top = param.surrounding_margin[0]
-    surrounding_margin_right = param.surrounding_margin[1]
-    surrounding_margin_bottom = param.surrounding_margin[2]
-    surrounding_margin_left = param.surrounding_margin[3]
 
+    # Create strips
+    run_row_tasks(param, tasks)
+def combine_into_images(param:AssembleParam, rows:list[RowData], frames:list[FrameData], layout:FrameLayout, output_path:str):
     
-    # Make sure folder exists
-    create_folder(output_path)
+    # Make sure folder exists (Written into as is, so re-runs onto a fixed path like previews overwrite their images)
+    os.makedirs(output_path, exist_ok=True)
 
 
-    # Iterate and create images
+    # Collect a task for every image (Every frame is its own canvas)
+    tasks = []
+    frame_index = 0
     for row_count, row_data in enumerate(rows):
 
-        # Create row folder
+        # Create row folder (Done here so workers only ever write images)
         row_folder = os.path.join(output_path, f"{row_count}_{row_data.label_text}")
-        create_folder(row_folder)
+        os.makedirs(row_folder, exist_ok=True)
 
 
-        # Save images
-        for img_count, img in enumerate(row_data.images):
+        # Add images
+        for img_count, frame in enumerate(row_data.frames):
+            img_output_path = apply_output_format(param.output_format, os.path.join(row_folder, f"{img_count}.{frame.format.lower()}"))
+            cells, cell_frames, labels = get_canvas_content(layout, rows, frames, frame_index)
+            tasks.append((row_data.label_text, create_canvas_output, (param, "image", frame.mode, layout.canvas(frame_index), cells, cell_frames, labels, img_output_path)))
+            frame_index += 1
 
-            # Get cell size
-            large_width, large_height = img.width, img.height
-            if(param.consistency == SpriteConsistency.ROW):
-                large_width, large_height = row_data.img_widest, row_data.img_tallest
-            elif(param.consistency == SpriteConsistency.ALL):
-                large_width, large_height = global_img_widest, global_img_tallest
-            
 
-            # Add margins
-            new_img_width = surrounding_margin_left + large_width + surrounding_margin_right
-            new_img_height = surrounding_margin_top + large_height + surrounding_margin_bottom
+    # Create images
+    run_row_tasks(param, tasks)
+def calc_pivot(align:SpriteAlign, frame:FrameData, cell:tuple[int, int, int, int], paste_position:tuple[int, int]):
 
+    # Anchor of the rendered frame (e.g. bottom center) is found where it ends up within the cell, so trimming doesn't move it
+    anchor_x, anchor_y = calc_align_offset(align, frame.source_width, frame.source_height, 0, 0)
+    pivot_x = paste_position[0] - cell[0] - frame.trim_box[0] + anchor_x
+    pivot_y = paste_position[1] - cell[1] - frame.trim_box[1] + anchor_y
+    return round(pivot_x / max(1, cell[2]), PIVOT_DECIMALS), round(pivot_y / max(1, cell[3]), PIVOT_DECIMALS)
+def collect_frame_records(param:AssembleParam, rows:list[RowData], layout:FrameLayout):
 
-            # Create new image
-            log(f"Creating image {new_img_width}x{new_img_height}")
-            bg_color = color_to_pil(param.background_color, img.mode)
-            new_img = Image.new(img.mode, (int(new_img_width), int(new_img_height)), bg_color)
-            
+    # Get record of every frame straight from layout (Deduplicated frames point at the cell they share)
+    records = []
+    frame_index = 0
+    duration = int(round(1000.0 / param.frame_rate)) if param.frame_rate > 0 else 0
+    row_names = calc_unique_row_names([row_data.name for row_data in rows])
+    for row_count, row_data in enumerate(rows):
+        for img_count, frame in enumerate(row_data.frames):
+            cell_index = layout.frame_cells[frame_index]
+            canvas_index, _, cell_x, cell_y, cell_width, cell_height, paste_x, paste_y = layout.cell(cell_index)
+            record = FrameRecord()
+            record.page = canvas_index
+            record.row = row_count
+            record.row_name = row_names[row_count]
+            record.index = img_count
+            record.cell_index = cell_index
+            record.cell = (cell_x, cell_y, cell_width, cell_height)
+            record.sprite = (paste_x, paste_y, frame.width, frame.height)
+            record.source_size = (frame.source_width, frame.source_height)
+            record.trim_offset = (frame.trim_box[0], frame.trim_box[1])
+            record.pivot = calc_pivot(param.align, frame, record.cell, (paste_x, paste_y))
+            record.duration = duration
+            records.append(record)
+            frame_index += 1
+
+
+    return records
+def get_page_images(layout:FrameLayout, output_path:str):
+    return [(calc_page_path(output_path, i, layout.canvas_count), layout.canvas(i)) for i in range(layout.canvas_count)]
+def combine_into_atlas(param:AssembleParam, rows:list[RowData], frames:list[FrameData], layout:FrameLayout, output_path:str):
+
+    # Report how much was saved by deduplicating
+    if(param.deduplicate_frames):
+        cell_areas = [layout.cells[i * CELL_STRIDE + 4] * layout.cells[i * CELL_STRIDE + 5] for i in range(layout.cell_count)]
+        saved_area = sum(cell_areas[cell_index] for cell_index in layout.frame_cells) - sum(cell_areas)
+        log(f"Deduplicated {len(frames) - layout.cell_count} of {len(frames)} frames, saving {saved_area} pixels of cell area")
+
+
+    # Create every page of the atlas (Only one unless a max texture size is set)
+    img_mode = frames[0].mode if len(frames) != 0 else DEFAULT_COLOR_MODE
+    page_count = layout.canvas_count
+    if(page_count > 1):
+        log(f"Splitting sprite atlas across {page_count} pages of at most {param.max_texture_size}px")
+    for canvas_index in range(page_count):
+        atlas_width, atlas_height = layout.canvas(canvas_index)
+        page_path = calc_page_path(output_path, canvas_index, page_count)
+        cells, cell_frames, labels = get_canvas_content(layout, rows, frames, canvas_index)
+        log(f"Creating sprite atlas {atlas_width}x{atlas_height} with {len(cell_frames)} frames")
+        atlas = compose_canvas(param, img_mode, (atlas_width, atlas_height), 0, cells, cell_frames, labels)
+        log(f"Saving sprite atlas to '{page_path}' ...")
+        save_combined_image(param, atlas, page_path)
+        log(f"Successfully saved sprite atlas to {page_path}")
+        del atlas
+
+
+    # Store frame rects (Along with where the sprite sits within its cell, trim offset & source size so the original pivot can be restored)
+    frames_metadata = []
+    for record in collect_frame_records(param, rows, layout):
+        cell_x, cell_y, cell_width, cell_height = record.cell
+        sprite_x, sprite_y, sprite_width, sprite_height = record.sprite
+        frames_metadata.append({
+            "row": record.row,
+            "page": record.page,
+            "label": rows[record.row].label_text,
+            "index": record.index,
+            "rect": { "x": cell_x, "y": cell_y, "w": cell_width, "h": cell_height },
+            "sprite_rect": { "x": sprite_x, "y": sprite_y, "w": sprite_width, "h": sprite_height },
+            "sprite_offset": { "x": sprite_x - cell_x, "y": sprite_y - cell_y },
+            "trimmed": record.source_size != (sprite_width, sprite_height),
+            "trim_offset": { "x": record.trim_offset[0], "y": record.trim_offset[1] },
+            "source_size": { "w": record.source_size[0], "h": record.source_size[1] }
+        })
+
+
+    # Save frame metadata next to atlas (Unless an engine format is requested instead or it's only a preview)
+    if(param.metadata_format != MetadataFormat.NONE or param.preview_scale > 1):
+        return
+
+    metadata_path = os.path.splitext(output_path)[0] + ATLAS_METADATA_EXTENSION
+    pages = [{ "image": os.path.basename(page_path), "size": { "w": width, "h": height } } for page_path, (width, height) in get_page_images(layout, output_path)]
+    metadata = {
+        "image": pages[0]["image"],
+        "size": pages[0]["size"],
+        "pages": pages,
+        "frames": frames_metadata
+    }
+    with open(metadata_path, 'w') as file:
+        json.dump(metadata, file, indent=4)
+    log(f"Successfully saved sprite atlas metadata to {metadata_path}")
+def scale_frame(frame:FrameData, scale:int):
+
+    # Size frame will have once reduced (Matches Image.reduce which rounds up)
+    frame.scale = scale
+    frame.width = max(1, math.ceil(frame.width / scale))
+    frame.height = max(1, math.ceil(frame.height / scale))
+def scale_param(param:AssembleParam, scale:int):  # Returns copy of param with every distance scaled down for a preview
+
+    # Scale distances along with the frames so the preview is a miniature of the full layout
+    preview_param = copy.copy(param)
+    preview_param.surrounding_margin = tuple(margin // scale for margin in param.surrounding_margin)
+    preview_param.label_margin = param.label_margin // scale
+    preview_param.image_margin = param.image_margin // scale
+    preview_param.font_size = max(1, round(param.font_size / scale)) if param.font_size != 0 else 0
+    preview_param.max_texture_size = max(1, param.max_texture_size // scale) if param.max_texture_size > 0 else 0
+
+
+    # Preview is a throwaway image so nothing else is saved or cached
+    preview_param.metadata_format = MetadataFormat.NONE
+    preview_param.incremental_assembly = False
+    return preview_param
+def read_manifest_frame(input_folder_path:str, entry:dict, frame_store:FrameStore = None, flip_h:bool = False, flip_v:bool = False):
+
+    # Fill frame data straight from its manifest entry (Nothing is read from disk)
+    frame = FrameData()
+    frame.path = os.path.join(input_folder_path, *entry["path"].split("/"))
+    frame.stored = get_stored_frame(frame_store, frame.path)
+    frame.flip_h = flip_h
+    frame.flip_v = flip_v
+    frame.source_width = frame.width = entry["width"]
+    frame.source_height = frame.height = entry["height"]
+    frame.mode = entry["mode"]
+    frame.format = entry["format"] if entry["format"] is not None else DEFAULT_FILE_FORMAT
+    frame.trim_box = (0, 0, frame.source_width, frame.source_height)
+    return frame
+def read_frames(param:AssembleParam, frame_paths:list[str], to_hash:bool, frame_store:FrameStore = None, flip_h:bool = False, flip_v:bool = False):
+
+    # Read frames across threads if prefetching (Decoding for trimming & hashing releases the GIL), frames keep their order
+    return map_threaded(lambda frame_path: read_frame_data(frame_path, param.trim_transparent, to_hash, get_stored_frame(frame_store, frame_path), flip_h, flip_v), frame_paths, param.prefetch_depth)
+def read_rows_from_manifest(param:AssembleParam, input_folder_path:str, manifest_rows:list, to_hash:bool, cache:AssemblyCache = None, frame_store:FrameStore = None):
+
+    # Assign row data in manifest order
+    rows:list[RowData] = []
+    for manifest_row in manifest_rows:
+        row_data = RowData()
+        row_data.name = manifest_row.label
 
-            # Calculate offset based on alignment & consistency
-            offset_x, offset_y = calc_align_offset(param.align, large_width, large_height, img.width, img.height)
 
+        # Pixels are only decoded when trimming or deduplicating, otherwise the manifest already has everything needed
+        if(param.trim_transparent or to_hash):
+            frame_paths = [os.path.join(input_folder_path, *entry["path"].split("/")) for entry in manifest_row.frames]
+            row_frames = read_frames(param, frame_paths, to_hash, frame_store, manifest_row.flip_h, manifest_row.flip_v)
+        else:
+            row_frames = [read_manifest_frame(input_folder_path, entry, frame_store, manifest_row.flip_h, manifest_row.flip_v) for entry in manifest_row.frames]
 
-            # Paste image
-            alpha_paste(new_img, img, (int(offset_x + surrounding_margin_left), int(offset_y + surrounding_margin_top)))
+
+        # Reuse hash from manifest (Still only trusted while file mtime & size match)
+        for entry, frame in zip(manifest_row.frames, row_frames):
+            if(cache is not None):
+                cache.add_known_hash(frame.path, entry["mtime_ns"], entry["size"], entry["hash"])
+                frame.file_hash = cache.hash_file(frame.path)
+            row_data.frames.append(frame)
+        rows.append(row_data)
 
 
-            # Save new image
-            ext = img.format if img.format is not None else DEFAULT_FILE_FORMAT
-            img_output_path = os.path.join(row_folder, f"{img_count}.{ext.lower()}")
-            log(f"Saving image to '{img_output_path}' ...")
-            new_img.save(img_output_path)
-            log(f"Successfully saved sprite image to {img_output_path}")
-def assemble_images(param:AssembleParam, input_folder_path:str, output_path:str):
+    return rows
+def parse_frame_number(img_name:str):  # Returns frame number of a '<frame>.<ext>' image (Negative if the animation starts before frame 0), None if it isn't named that way
+    try:
+        return int(img_name.split('.')[0])
+    except ValueError:
+        return None
+def scan_rows(param:AssembleParam, input_folder_path:str, to_hash:bool, cache:AssemblyCache = None, frame_store:FrameStore = None):
 
-    # Load font and Get all sorted action sub folders
-    font = ImageFont.load_default(param.font_size) if param.font_size !=0 else None
+    # Get all sorted action sub folders (Anything not named '<index>_<name>' is skipped)
     action_folders = sorted(
-        [folder for folder in os.listdir(input_folder_path) if os.path.isdir(os.path.join(input_folder_path, folder))],
+        [folder for folder in os.listdir(input_folder_path) if os.path.isdir(os.path.join(input_folder_path, folder)) and '_' in folder and folder.split('_')[0].isdigit()],
         key=lambda x: int(x.split('_')[0])
     )
     log(f"Found {len(action_folders)} action sub folders")
 
 
-    # Assign row data from folders 
-    global_img_widest:int = 0
-    global_img_tallest:int = 0
+    # Assign row data from folders (First pass only reads image headers, pixels are decoded later one frame at a time while pasting)
     rows:list[RowData] = []
-    base_labels:list[str] = []
     for action_folder in action_folders:
 
         # Create row data
         row_data = RowData()
-        base_labels.append(action_folder.split('_', 1)[1])
+        row_data.name = action_folder.split('_', 1)[1]
 
 
-        # Images
+        # Images (Anything not named '<frame>.<ext>' is skipped, flips are read from the row's flip file)
         abs_action_folder = os.path.join(input_folder_path, action_folder)
-        img_names = sorted(os.listdir(abs_action_folder), key=lambda x: int(x.split('.')[0]))
-        for img_name in img_names:
-
-            # Add image to row data
-            img = Image.open(os.path.join(abs_action_folder, img_name))
-            row_data.images.append(img)
+        img_names = sorted([img_name for img_name in os.listdir(abs_action_folder) if parse_frame_number(img_name) is not None], key=parse_frame_number)
+        flip_h, flip_v = read_row_flip(abs_action_folder)
+        for frame in read_frames(param, [os.path.join(abs_action_folder, img_name) for img_name in img_names], to_hash, frame_store, flip_h, flip_v):
 
-            # Add accumulated width, widest img width & tallest img height to row data
-            row_data.img_accum_width += img.width
-            row_data.img_widest = max(row_data.img_widest, img.width)
-            row_data.img_tallest = max(row_data.img_tallest, img.height)
-
-            # Calculate widest & tallest images amongst all
-            global_img_widest = max(global_img_widest, img.width)
-            global_img_tallest = max(global_img_tallest, img.height)
+            # Add frame to row data
+            if(cache is not None):
+                frame.file_hash = cache.hash_file(frame.path)
+            row_data.frames.append(frame)
 
 
         # Append row data
         rows.append(row_data)
 
 
+    return rows
+def assemble_images(param:AssembleParam, input_folder_path:str, output_path:str, frame_store:FrameStore = None):  # Frames kept in frame store are read from it rather than from their files
+
+    # Preview shrinks every distance along with the frames (Labels still show full size rows)
+    full_param = param
+    if(param.preview_scale > 1):
+        log(f"Creating preview at 1/{param.preview_scale} scale")
+        param = scale_param(param, param.preview_scale)
+
+
+    # Frames are only hashed when they can actually be deduplicated
+    to_hash = param.deduplicate_frames and param.combine_mode == CombineMode.ATLAS
+    if(param.deduplicate_frames and not to_hash):
+        log("Frame deduplication only applies to Atlas combine mode, skipping")
+
+
+    # Indexed output only applies to single file outputs
+    if(param.indexed_output and param.combine_mode not in [CombineMode.SHEET, CombineMode.ATLAS]):
+        log("Indexed output only applies to Sheet & Atlas combine modes, skipping")
+
+
+    # Only sheet rows wrap into columns
+    if((param.max_columns > 0 or param.target_aspect > 0) and param.combine_mode != CombineMode.SHEET):
+        log("Max columns & target aspect only apply to Sheet combine mode, skipping")
+
+
+    # Row bands are only cached for sheets
+    cache = AssemblyCache(input_folder_path) if param.incremental_assembly and param.combine_mode == CombineMode.SHEET else None
+    if(param.incremental_assembly and cache is None):
+        log("Incremental assembly only applies to Sheet combine mode, skipping")
+
+
+    # Get rows & frames from the manifest written while capturing, only scanning folders if there's none
+    manifest_rows = read_frame_manifest(input_folder_path)
+    if(manifest_rows is not None):
+        log(f"Found {len(manifest_rows)} rows in frame manifest")
+        rows = read_rows_from_manifest(param, input_folder_path, manifest_rows, to_hash, cache, frame_store)
+    else:
+        rows = scan_rows(param, input_folder_path, to_hash, cache, frame_store)
+
+
+    # Get frame sizes (Layout is calculated from sizes alone)
+    frame_sizes = [[(frame.width, frame.height) for frame in row_data.frames] for row_data in rows]
+    frames = [frame for row_data in rows for frame in row_data.frames]
+    row_sizes = calc_row_sizes(full_param, frame_sizes) if param.label_show_row_size else []
+
+
+    # Scale frames down for a preview
+    if(param.preview_scale > 1):
+        for frame in frames:
+            scale_frame(frame, param.preview_scale)
+        frame_sizes = [[(frame.width, frame.height) for frame in row_data.frames] for row_data in rows]
+
+
     # Build labels (along with frame count and row size)
-    for row_data, base_label_text in zip(rows, base_labels):
+    for row_count, row_data in enumerate(rows):
 
         # Build label postfix (Frame Count always comes before Row Size when both are enabled)
         label_postfix = ""
         if param.label_show_frame_count:
-            label_postfix += f" [{len(row_data.images)}]"
+            label_postfix += f" [{len(row_data.frames)}]"
         if param.label_show_row_size:
-            row_width, row_height = calc_row_size(param, row_data, global_img_widest, global_img_tallest)
+            row_width, row_height = row_sizes[row_count]
             label_postfix += f" ({row_width} x {row_height})"
 
 
         # Add label to row data
-        row_data.label_text = base_label_text + label_postfix
-        label_bbox = (0, 0, 0, 0) if param.font_size == 0 else font.getbbox(row_data.label_text)
+        row_data.label_text = row_data.name + label_postfix
+        label_bbox = (0, 0, 0, 0) if param.font_size == 0 else measure_label(row_data.label_text, param.font_size)
         row_data.label_width = (label_bbox[2] - label_bbox[0])
         row_data.label_height = (label_bbox[3] - label_bbox[1]) 
         row_data.label_offset = (0, -label_bbox[1])
 
 
-    # Combine into sheet or strips 
+    # Calculate layout (Pixel identical frames only share a cell when deduplicating)
+    label_sizes = [(row_data.label_width, row_data.label_height, row_data.label_offset[0], row_data.label_offset[1]) for row_data in rows]
+    share_keys = [frame.content_hash for frame in frames] if to_hash else None
+    layout = calc_layout(param, frame_sizes, label_sizes, share_keys)
+    log(f"Calculated layout of {layout.cell_count} cells across {layout.canvas_count} canvases")
+    if(param.max_texture_size > 0 and param.combine_mode in [CombineMode.SHEET, CombineMode.ATLAS]):
+        for canvas_index in range(layout.canvas_count):
+            page_width, page_height = layout.canvas(canvas_index)
+            if(page_width > param.max_texture_size or page_height > param.max_texture_size):
+                log(f"Page {canvas_index} is {page_width}x{page_height} since a single frame (along with its row's label) doesn't fit within the max texture size of {param.max_texture_size}px")
+
+
+    # Sheet & atlas are single files so their path takes the requested format (Strips & images get it per file)
+    if(param.combine_mode in [CombineMode.SHEET, CombineMode.ATLAS]):
+        output_path = apply_output_format(param.output_format, output_path)
+
+
+    # Return layout without creating any output if only a dry run
+    if(param.dry_run):
+        return layout
+
+
+    # Combine into sheet, strips, images or atlas
     if(param.combine_mode == CombineMode.SHEET):
-        combine_into_sheet(param, rows, global_img_widest, global_img_tallest, output_path)
+        combine_into_sheet(param, rows, frames, layout, output_path, cache)
     elif(param.combine_mode == CombineMode.STRIPS):
-        combine_into_strips(param, rows, global_img_widest, global_img_tallest, output_path)
+        combine_into_strips(param, rows, frames, layout, output_path)
     elif(param.combine_mode == CombineMode.IMAGES):
-        combine_into_images(param, rows, global_img_widest, global_img_tallest, output_path)
+        combine_into_images(param, rows, frames, layout, output_path)
+    elif(param.combine_mode == CombineMode.ATLAS):
+        combine_into_atlas(param, rows, frames, layout, output_path)
+
+
+    # Save engine metadata (Straight from the layout so the output is never read back)
+    if(param.metadata_format != MetadataFormat.NONE):
+        if(param.combine_mode in [CombineMode.SHEET, CombineMode.ATLAS]):
+            metadata_path = export_metadata(param.metadata_format, collect_frame_records(param, rows, layout), output_path, get_page_images(layout, output_path), param.frame_rate)
+            log(f"Successfully saved {param.metadata_format.value} metadata to {metadata_path}")
+        else:
+            log("Metadata export only applies to Sheet & Atlas combine modes, skipping")
+
+
+    return layout
@@ -0,0 +1,489 @@
+import math
+from array import array
+from itertools import accumulate
+from collections import OrderedDict
+from enum import Enum
+from .frame_packing import pack_rects, pack_pages
+
+
+# Constants
+CANVAS_STRIDE = 2  # width, height
+CELL_STRIDE = 8  # canvas index, frame index, cell x, cell y, cell width, cell height, paste x, paste y
+LABEL_STRIDE = 4  # canvas index, row index, x, y
+LAYOUT_CACHE_SIZE = 8  # Layouts kept around so re-runs with unchanged frames & settings skip layout entirely
+
+
+# Enums
+class SpriteAlign(Enum):
+    TOP_LEFT = "Top Left"
+    TOP_CENTER = "Top Center"
+    TOP_RIGHT = "Top Right"
+    MIDDLE_LEFT = "Middle Left"
+    MIDDLE_CENTER = "Middle Center"
+    MIDDLE_RIGHT = "Middle Right"
+    BOTTOM_LEFT = "Bottom Left"
+    BOTTOM_CENTER = "Bottom Center"
+    BOTTOM_RIGHT = "Bottom Right"
+class SpriteConsistency(Enum):
+    INDIVIDUAL = "Individual Consistent"
+    ROW = "Row Consistent"
+    ALL = "All Consistent"
+class CombineMode(Enum):
+    IMAGES = "Images"
+    STRIPS = "Strips"
+    SHEET = "Sheet"
+    ATLAS = "Atlas"
+
+
+# Classes
+class FrameLayout:  # Positions only, no pixels (Every record is a flat run of ints so huge layouts stay compact & cheap to send to worker processes)
+    def __init__(self):
+        self.canvases = array('i')  # CANVAS_STRIDE ints per output image
+        self.cells = array('i')  # CELL_STRIDE ints per pasted frame, sorted by canvas
+        self.labels = array('i')  # LABEL_STRIDE ints per row label
+        self.canvas_cells = array('i')  # First cell of every canvas followed by the total cell count
+        self.row_cells = array('i')  # First cell of every row followed by the total cell count (Not used by Atlas since cells aren't kept in row order, Sheet has one per row band instead)
+        self.row_tops = array('i')  # Top of every row (label included) within its canvas (Sheet has one per row band instead)
+        self.canvas_rows = array('i')  # First row band of every canvas followed by the total band count (Sheet only)
+        self.band_rows = array('i')  # Row of every band (Sheet only, a row is a single band unless its wrapped lines are split across pages)
+        self.frame_cells = array('i')  # Cell of every frame (Deduplicated frames share the same cell)
+    @property
+    def canvas_count(self):
+        return len(self.canvases) // CANVAS_STRIDE
+    @property
+    def cell_count(self):
+        return len(self.cells) // CELL_STRIDE
+    @property
+    def label_count(self):
+        return len(self.labels) // LABEL_STRIDE
+    def canvas(self, index:int):
+        return tuple(self.canvases[index * CANVAS_STRIDE:(index + 1) * CANVAS_STRIDE])
+    def cell(self, index:int):
+        return tuple(self.cells[index * CELL_STRIDE:(index + 1) * CELL_STRIDE])
+    def label(self, index:int):
+        return tuple(self.labels[index * LABEL_STRIDE:(index + 1) * LABEL_STRIDE])
+
+
+# Globals
+layout_cache:OrderedDict = OrderedDict()  # { layout key: FrameLayout }
+
+
+# Methods
+def calc_align_offset(align:SpriteAlign, large_width:int, large_height:int, small_width:int, small_height:int):
+
+    x_offset = 0.0
+    y_offset = 0.0
+
+
+    # Get X Offset
+    if(align in [SpriteAlign.TOP_LEFT, SpriteAlign.MIDDLE_LEFT, SpriteAlign.BOTTOM_LEFT]):
+        x_offset = 0.0
+    elif(align in [SpriteAlign.TOP_CENTER, SpriteAlign.MIDDLE_CENTER, SpriteAlign.BOTTOM_CENTER]):
+        x_offset = (large_width - small_width) / 2.0
+    elif(align in [SpriteAlign.TOP_RIGHT, SpriteAlign.MIDDLE_RIGHT, SpriteAlign.BOTTOM_RIGHT]):
+        x_offset = (large_width - small_width)
+
+
+    # Get Y Offset
+    if(align in [SpriteAlign.TOP_LEFT, SpriteAlign.TOP_CENTER, SpriteAlign.TOP_RIGHT]):
+        y_offset = 0.0
+    elif(align in [SpriteAlign.MIDDLE_LEFT, SpriteAlign.MIDDLE_CENTER, SpriteAlign.MIDDLE_RIGHT]):
+        y_offset = (large_height - small_height) / 2.0
+    elif(align in [SpriteAlign.BOTTOM_LEFT, SpriteAlign.BOTTOM_CENTER, SpriteAlign.BOTTOM_RIGHT]):
+        y_offset = (large_height - small_height)
+
+
+    return int(x_offset), int(y_offset)
+def calc_cell_size(consistency:SpriteConsistency, frame_width:int, frame_height:int, row_stats:tuple[int, int, int], global_img_widest:int, global_img_tallest:int):
+
+    # Get cell size of a single frame based on sprite consistency
+    if(consistency == SpriteConsistency.ROW):
+        return row_stats[1], row_stats[2]
+    elif(consistency == SpriteConsistency.ALL):
+        return global_img_widest, global_img_tallest
+
+    return frame_width, frame_height
+def calc_row_stats(frame_sizes:list[list[tuple[int, int]]]):
+
+    # Get accumulated width, widest & tallest image of every row along with widest & tallest image amongst all
+    row_stats = []  # [(img_accum_width, img_widest, img_tallest), ...]
+    global_img_widest = 0
+    global_img_tallest = 0
+    for row_sizes in frame_sizes:
+        img_widest = max((width for (width, _) in row_sizes), default=0)
+        img_tallest = max((height for (_, height) in row_sizes), default=0)
+        row_stats.append((sum(width for (width, _) in row_sizes), img_widest, img_tallest))
+        global_img_widest = max(global_img_widest, img_widest)
+        global_img_tallest = max(global_img_tallest, img_tallest)
+
+
+    return row_stats, global_img_widest, global_img_tallest
+def calc_row_size(param, row_sizes:list[tuple[int, int]], row_stats:tuple[int, int, int], global_img_widest:int, global_img_tallest:int, column_count:int = 0, width_sums:list[int] = None):  # width_sums = running total of frame widths starting from 0, makes wrapped individual rows O(sub rows)
+
+    # Get essentials (Row wraps onto sub rows of column count frames each, 0 keeps it on a single line)
+    img_accum_width, img_widest, img_tallest = row_stats
+    img_count = len(row_sizes)
+    columns = min(column_count, img_count) if column_count > 0 else img_count
+    sub_row_count = max(1, math.ceil(img_count / max(1, columns)))
+    gaps = param.image_margin * (columns - 1)
+
+
+    # Calculate row width & height (Widest sub row sets the width)
+    if(param.consistency == SpriteConsistency.INDIVIDUAL):
+        if(columns == img_count):
+            row_width = img_accum_width + gaps
+        elif(width_sums is not None):
+            row_width = max(width_sums[min(i + columns, img_count)] - width_sums[i] for i in range(0, img_count, columns)) + gaps
+        else:
+            row_width = max(sum(width for (width, _) in row_sizes[i:i + columns]) for i in range(0, img_count, columns)) + gaps
+        row_height = img_tallest
+    elif(param.consistency == SpriteConsistency.ROW):
+        row_width = (img_widest * columns) + gaps
+        row_height = img_tallest
+    elif(param.consistency == SpriteConsistency.ALL):
+        row_width = (global_img_widest * columns) + gaps
+        row_height = global_img_tallest
+
+
+    # Stack sub rows (Image margin is kept between them too)
+    row_height = (row_height * sub_row_count) + param.image_margin * (sub_row_count - 1)
+    return int(row_width), int(row_height)
+def calc_fit_columns(param, frame_sizes:list[list[tuple[int, int]]], row_stats:list, global_img_widest:int, max_width:int):  # Returns most frames per line that keep every row within max width (0 = every row already fits on a single line)
+
+    # Find the most frames per line of every row that's too wide (Any run of that many consecutive frames fits, so every sub row does too)
+    fit_columns = 0
+    for row_sizes, stats in zip(frame_sizes, row_stats):
+        if(calc_row_size(param, row_sizes, stats, global_img_widest, 0)[0] <= max_width):
+            continue
+        if(param.consistency == SpriteConsistency.INDIVIDUAL):
+            columns = len(row_sizes)
+            end = 0
+            run_width = 0
+            for start in range(len(row_sizes)):
+                if(end <= start):
+                    end, run_width = start, 0
+                while(end < len(row_sizes) and run_width + row_sizes[end][0] + param.image_margin * (end - start) <= max_width):
+                    run_width += row_sizes[end][0]
+                    end += 1
+                if(end == len(row_sizes)):
+                    break
+                columns = min(columns, max(1, end - start))
+                if(end > start):
+                    run_width -= row_sizes[start][0]
+        else:
+            cell_width = stats[1] if param.consistency == SpriteConsistency.ROW else global_img_widest
+            columns = max(1, (max_width + param.image_margin) // (cell_width + param.image_margin))
+        fit_columns = columns if fit_columns == 0 else min(fit_columns, columns)
+
+
+    return fit_columns
+def calc_column_count(param, frame_sizes:list[list[tuple[int, int]]], row_stats:list, global_img_widest:int, global_img_tallest:int):  # Returns column count every row of the sheet wraps at (0 = no wrapping)
+
+    # Return if wrapping isn't needed (Only sheets wrap since every other mode is laid out per row or packed)
+    if(param.combine_mode != CombineMode.SHEET):
+        return 0
+    surrounding_margin = param.surrounding_margin
+    fit_columns = calc_fit_columns(param, frame_sizes, row_stats, global_img_widest, param.max_texture_size - surrounding_margin[1] - surrounding_margin[3]) if param.max_texture_size > 0 else 0
+
+
+    # Cap column count so rows stay within max texture size (Rows too wide for it wrap even if wrapping isn't requested)
+    column_limit = min((column_count for column_count in (param.max_columns, fit_columns) if column_count > 0), default=0)
+    if(param.target_aspect <= 0):
+        return column_limit
+
+
+    # Get essentials (Label height is estimated from font size since labels are measured after row sizes are known)
+    longest_row = max((len(row_sizes) for row_sizes in frame_sizes), default=0)
+    max_columns = min(longest_row, column_limit) if column_limit > 0 else longest_row
+    label_height = (param.font_size + param.label_margin) if param.font_size != 0 else 0
+    label_gaps = param.label_margin * max(0, len(frame_sizes) - 1)
+    width_sums = [list(accumulate((width for (width, _) in sizes), initial=0)) for sizes in frame_sizes] if param.consistency == SpriteConsistency.INDIVIDUAL else [None] * len(frame_sizes)
+
+
+    # Try every column count & keep the one whose sheet is closest to the target aspect (Ties go to the smaller sheet, every try only sums up sub rows)
+    best = None  # (aspect error, area, column count)
+    for column_count in range(1, max_columns + 1):
+        row_sizes = [calc_row_size(param, sizes, stats, global_img_widest, global_img_tallest, column_count, sums) for sizes, stats, sums in zip(frame_sizes, row_stats, width_sums)]
+        sheet_width = max(1, max(width for (width, _) in row_sizes) + surrounding_margin[1] + surrounding_margin[3])
+        sheet_height = max(1, sum(height + label_height for (_, height) in row_sizes) + label_gaps + surrounding_margin[0] + surrounding_margin[2])
+        candidate = (abs(math.log(sheet_width / sheet_height / param.target_aspect)), sheet_width * sheet_height, column_count)
+        if best is None or candidate < best:
+            best = candidate
+
+
+    return best[2] if best is not None else 0
+def calc_row_sizes(param, frame_sizes:list[list[tuple[int, int]]]):
+    row_stats, global_img_widest, global_img_tallest = calc_row_stats(frame_sizes)
+    column_count = calc_column_count(param, frame_sizes, row_stats, global_img_widest, global_img_tallest)
+    return [calc_row_size(param, row_sizes, stats, global_img_widest, global_img_tallest, column_count) for row_sizes, stats in zip(frame_sizes, row_stats)]
+def add_cell(layout:FrameLayout, canvas_index:int, frame_index:int, cell_x:int, cell_y:int, cell_width:int, cell_height:int, paste_x:int, paste_y:int):
+    layout.cells.extend((canvas_index, frame_index, cell_x, cell_y, cell_width, cell_height, paste_x, paste_y))
+def add_canvas(layout:FrameLayout, width:int, height:int):
+    layout.canvases.extend((int(width), int(height)))
+def add_grid_row(param, layout:FrameLayout, canvas_index:int, frame_index:int, row_sizes:list[tuple[int, int]], row_stats:tuple[int, int, int], global_img_widest:int, global_img_tallest:int, left:int, top:int, column_count:int = 0):
+
+    # Place cells left to right (Cells are as tall as the row unless sprite consistency says otherwise)
+    paste_width = left
+    for img_count, (width, height) in enumerate(row_sizes):
+
+        # Wrap onto the next sub row once the column count is reached (Every sub row is as tall as the cells)
+        cell_width, cell_height = calc_cell_size(param.consistency, width, row_stats[2], row_stats, global_img_widest, global_img_tallest)
+        if(column_count > 0 and img_count != 0 and img_count % column_count == 0):
+            paste_width = left
+            top += cell_height + param.image_margin
+
+
+        # Place cell
+        offset_x, offset_y = calc_align_offset(param.align, cell_width, cell_height, width, height)
+        layout.frame_cells.append(layout.cell_count)
+        add_cell(layout, canvas_index, frame_index, paste_width, top, cell_width, cell_height, paste_width + offset_x, top + offset_y)
+        paste_width += cell_width + param.image_margin
+        frame_index += 1
+def add_sheet_page(layout:FrameLayout, surrounding_margin:list, sheet_width:int, sheet_height:int):
+
+    # Close current page with margins added & start the next one at the current cell & band
+    add_canvas(layout, sheet_width + surrounding_margin[1] + surrounding_margin[3], sheet_height + surrounding_margin[0] + surrounding_margin[2])
+    layout.canvas_cells.append(layout.cell_count)
+    layout.canvas_rows.append(len(layout.row_tops))
+def layout_sheet(param, layout:FrameLayout, frame_sizes:list, label_sizes:list, row_stats:list, global_img_widest:int, global_img_tallest:int, column_count:int = 0):
+
+    # Extract from param
+    surrounding_margin = param.surrounding_margin
+    label_margin = param.label_margin
+    has_labels = param.font_size != 0
+    max_sheet_width = param.max_texture_size - surrounding_margin[1] - surrounding_margin[3]  # Width left for rows on every page
+    max_sheet_height = param.max_texture_size - surrounding_margin[0] - surrounding_margin[2]  # Height left for rows on every page
+
+
+    # Stack rows (label included) top to bottom, starting a new page whenever the next row would make the current one too tall or too wide
+    sheet_width = 0
+    sheet_height = 0
+    frame_index = 0
+    canvas_index = 0
+    layout.canvas_cells.append(0)
+    layout.canvas_rows.append(0)
+    for row_count, (row_sizes, (label_width, label_height, label_offset_x, label_offset_y)) in enumerate(zip(frame_sizes, label_sizes)):
+
+        # Calculate row size along with the height of each of its wrapped lines
+        row_width, row_height = calc_row_size(param, row_sizes, row_stats[row_count], global_img_widest, global_img_tallest, column_count)
+        line_count = math.ceil(len(row_sizes) / column_count) if column_count > 0 and len(row_sizes) > 0 else 1
+        line_height = (row_height - param.image_margin * (line_count - 1)) // line_count
+        first_line = 0
+        while(True):
+
+            # Spill rest of the row onto the next page (Every page holds at least one line, label only goes above the first one)
+            is_first_on_page = len(layout.row_tops) == layout.canvas_rows[-1]
+            band_label_width = label_width if first_line == 0 else 0
+            band_label_height = (label_height + label_margin) if has_labels and first_line == 0 else 0
+            band_height = band_label_height + line_height * (line_count - first_line) + param.image_margin * (line_count - first_line - 1)
+            is_too_tall = sheet_height + (0 if is_first_on_page else label_margin) + band_height > max_sheet_height
+            is_too_wide = max(sheet_width, row_width, band_label_width) > max_sheet_width
+            if(param.max_texture_size > 0 and not is_first_on_page and (is_too_tall or is_too_wide)):
+                add_sheet_page(layout, surrounding_margin, sheet_width, sheet_height)
+                sheet_width = 0
+                sheet_height = 0
+                canvas_index += 1
+                continue
+
+
+            # Keep only the lines that fit if the row is too tall even for a page of its own
+            band_lines = line_count - first_line
+            if(param.max_texture_size > 0 and is_too_tall):
+                band_lines = min(band_lines, max(1, (max_sheet_height - sheet_height - band_label_height + param.image_margin) // (line_height + param.image_margin)))
+                band_height = band_label_height + line_height * band_lines + param.image_margin * (band_lines - 1)
+
+
+            # Additional top label margin
+            if(not is_first_on_page):
+                sheet_height += label_margin
+
+
+            # Place label
+            band_top = surrounding_margin[0] + sheet_height
+            paste_height = band_top
+            layout.row_tops.append(band_top)
+            layout.band_rows.append(row_count)
+            if(band_label_height != 0):
+                layout.labels.extend((canvas_index, row_count, surrounding_margin[3] + label_offset_x, band_top + label_offset_y))
+                paste_height += band_label_height
+
+
+            # Place images of the lines in this band
+            first_frame = first_line * column_count
+            band_sizes = row_sizes[first_frame:first_frame + band_lines * column_count] if column_count > 0 else row_sizes
+            layout.row_cells.append(layout.cell_count)
+            add_grid_row(param, layout, canvas_index, frame_index + first_frame, band_sizes, row_stats[row_count], global_img_widest, global_img_tallest, surrounding_margin[3], paste_height, column_count)
+
+
+            # Add to height & width (Part of a row split across pages is only as wide as its own lines)
+            band_width = row_width
+            if(band_lines != line_count):
+                band_stats = (sum(width for (width, _) in band_sizes), row_stats[row_count][1], row_stats[row_count][2])
+                band_width = calc_row_size(param, band_sizes, band_stats, global_img_widest, global_img_tallest, column_count)[0]
+            sheet_width = max(sheet_width, band_width, band_label_width)
+            sheet_height += band_height
+
+
+            # Continue on the next page if lines are left over
+            first_line += band_lines
+            if(first_line >= line_count):
+                break
+            add_sheet_page(layout, surrounding_margin, sheet_width, sheet_height)
+            sheet_width = 0
+            sheet_height = 0
+            canvas_index += 1
+        frame_index += len(row_sizes)
+
+
+    # Add margins to dimensions of the last page
+    add_canvas(layout, sheet_width + surrounding_margin[1] + surrounding_margin[3], sheet_height + surrounding_margin[0] + surrounding_margin[2])
+    layout.row_cells.append(layout.cell_count)
+    layout.canvas_cells.append(layout.cell_count)
+    layout.canvas_rows.append(len(layout.row_tops))
+def layout_strips(param, layout:FrameLayout, frame_sizes:list, label_sizes:list, row_stats:list, global_img_widest:int, global_img_tallest:int):
+
+    # Extract from param
+    surrounding_margin = param.surrounding_margin
+    label_margin = param.label_margin
+    has_labels = param.font_size != 0
+
+
+    # Place every row on its own canvas
+    frame_index = 0
+    for row_count, (row_sizes, (label_width, label_height, label_offset_x, label_offset_y)) in enumerate(zip(frame_sizes, label_sizes)):
+
+        # Assign strip height & width
+        row_width, img_height = calc_row_size(param, row_sizes, row_stats[row_count], global_img_widest, global_img_tallest)
+        strip_width = surrounding_margin[3] + max(row_width, label_width) + surrounding_margin[1]
+        strip_height = surrounding_margin[0] + ((label_height + label_margin) if has_labels else 0) + img_height + surrounding_margin[2]
+        add_canvas(layout, strip_width, strip_height)
+
+
+        # Place label
+        paste_height = surrounding_margin[0]
+        layout.row_tops.append(paste_height)
+        if(has_labels):
+            layout.labels.extend((row_count, row_count, surrounding_margin[3] + label_offset_x, surrounding_margin[0] + label_offset_y))
+            paste_height += label_height + label_margin
+
+
+        # Place images
+        layout.canvas_cells.append(layout.cell_count)
+        layout.row_cells.append(layout.cell_count)
+        add_grid_row(param, layout, row_count, frame_index, row_sizes, row_stats[row_count], global_img_widest, global_img_tallest, surrounding_margin[3], paste_height)
+        frame_index += len(row_sizes)
+
+
+    layout.row_cells.append(layout.cell_count)
+    layout.canvas_cells.append(layout.cell_count)
+def layout_images(param, layout:FrameLayout, frame_sizes:list, row_stats:list, global_img_widest:int, global_img_tallest:int):
+
+    # Extract from param
+    surrounding_margin = param.surrounding_margin
+
+
+    # Place every frame on its own padded canvas
+    frame_index = 0
+    for row_count, row_sizes in enumerate(frame_sizes):
+        layout.row_tops.append(surrounding_margin[0])
+        layout.row_cells.append(layout.cell_count)
+        for width, height in row_sizes:
+            cell_width, cell_height = calc_cell_size(param.consistency, width, height, row_stats[row_count], global_img_widest, global_img_tallest)
+            offset_x, offset_y = calc_align_offset(param.align, cell_width, cell_height, width, height)
+            add_canvas(layout, surrounding_margin[3] + cell_width + surrounding_margin[1], surrounding_margin[0] + cell_height + surrounding_margin[2])
+            layout.canvas_cells.append(layout.cell_count)
+            layout.frame_cells.append(layout.cell_count)
+            add_cell(layout, frame_index, frame_index, surrounding_margin[3], surrounding_margin[0], cell_width, cell_height, surrounding_margin[3] + offset_x, surrounding_margin[0] + offset_y)
+            frame_index += 1
+
+
+    layout.row_cells.append(layout.cell_count)
+    layout.canvas_cells.append(layout.cell_count)
+def layout_atlas(param, layout:FrameLayout, frame_sizes:list, share_keys:list, row_stats:list, global_img_widest:int, global_img_tallest:int):
+
+    # Extract from param
+    surrounding_margin = param.surrounding_margin
+
+
+    # Get cell of every frame (Frames with the same share key & cell size share a single cell)
+    cells = []  # [(frame index, width, height, cell_width, cell_height), ...]
+    cell_keys = {}  # { (share key, cell_width, cell_height): cell index }
+    frame_cells = []  # Index into cells of every frame
+    frame_index = 0
+    for row_count, row_sizes in enumerate(frame_sizes):
+        for width, height in row_sizes:
+            cell_width, cell_height = calc_cell_size(param.consistency, width, height, row_stats[row_count], global_img_widest, global_img_tallest)
+            cell_key = (share_keys[frame_index] if share_keys is not None else frame_index, cell_width, cell_height)
+            if(cell_key not in cell_keys):
+                cell_keys[cell_key] = len(cells)
+                cells.append((frame_index, width, height, cell_width, cell_height))
+            frame_cells.append(cell_keys[cell_key])
+            frame_index += 1
+
+
+    # Pack cells (Image margin is kept between cells), spilling onto extra pages if a single one would exceed the max texture size
+    cell_sizes = [(cell_width, cell_height) for (_, _, _, cell_width, cell_height) in cells]
+    if(param.max_texture_size > 0):
+        pages = pack_pages(cell_sizes, param.image_margin, param.max_texture_size - surrounding_margin[1] - surrounding_margin[3], param.max_texture_size - surrounding_margin[0] - surrounding_margin[2])
+    else:
+        positions, packed_width, packed_height = pack_rects(cell_sizes, param.image_margin)
+        pages = [(list(range(len(cells))), positions, packed_width, packed_height)]
+
+
+    # Place cells page by page (Cells are stored sorted by page so they're renumbered as they're placed)
+    cell_indices = [0] * len(cells)
+    for canvas_index, (page_cells, positions, packed_width, packed_height) in enumerate(pages):
+        add_canvas(layout, surrounding_margin[3] + packed_width + surrounding_margin[1], surrounding_margin[0] + packed_height + surrounding_margin[2])
+        layout.canvas_cells.append(layout.cell_count)
+        for i, (x, y) in zip(page_cells, positions):
+            frame_index, width, height, cell_width, cell_height = cells[i]
+            cell_x = surrounding_margin[3] + x
+            cell_y = surrounding_margin[0] + y
+            offset_x, offset_y = calc_align_offset(param.align, cell_width, cell_height, width, height)
+            cell_indices[i] = layout.cell_count
+            add_cell(layout, canvas_index, frame_index, cell_x, cell_y, cell_width, cell_height, cell_x + offset_x, cell_y + offset_y)
+    layout.canvas_cells.append(layout.cell_count)
+    layout.frame_cells.extend(cell_indices[i] for i in frame_cells)
+def build_layout(param, frame_sizes:list[list[tuple[int, int]]], label_sizes:list[tuple[int, int, int, int]], share_keys:list = None):
+
+    # Place every canvas, cell & label from sizes alone
+    layout = FrameLayout()
+    row_stats, global_img_widest, global_img_tallest = calc_row_stats(frame_sizes)
+    if(param.combine_mode == CombineMode.SHEET):
+        column_count = calc_column_count(param, frame_sizes, row_stats, global_img_widest, global_img_tallest)
+        layout_sheet(param, layout, frame_sizes, label_sizes, row_stats, global_img_widest, global_img_tallest, column_count)
+    elif(param.combine_mode == CombineMode.STRIPS):
+        layout_strips(param, layout, frame_sizes, label_sizes, row_stats, global_img_widest, global_img_tallest)
+    elif(param.combine_mode == CombineMode.IMAGES):
+        layout_images(param, layout, frame_sizes, row_stats, global_img_widest, global_img_tallest)
+    elif(param.combine_mode == CombineMode.ATLAS):
+        layout_atlas(param, layout, frame_sizes, share_keys, row_stats, global_img_widest, global_img_tallest)
+
+
+    return layout
+def calc_layout_key(param, frame_sizes:list, label_sizes:list, share_keys:list = None):
+
+    # Only settings that move things around are part of the key (Colors, backends etc. don't change the layout)
+    settings = (param.combine_mode, param.consistency, param.align, tuple(param.surrounding_margin), param.label_margin, param.image_margin, param.font_size != 0, param.max_texture_size, param.max_columns, param.target_aspect)
+    sizes = tuple(tuple(row_sizes) for row_sizes in frame_sizes)
+    return (settings, sizes, tuple(label_sizes), tuple(share_keys) if share_keys is not None else None)
+def calc_layout(param, frame_sizes:list[list[tuple[int, int]]], label_sizes:list[tuple[int, int, int, int]], share_keys:list = None):  # Returned layout is shared with the cache so it must not be modified
+
+    # Reuse layout if nothing that affects it has changed
+    key = calc_layout_key(param, frame_sizes, label_sizes, share_keys)
+    layout = layout_cache.get(key)
+    if layout is not None:
+        layout_cache.move_to_end(key)
+        return layout
+
+
+    # Build & cache layout (Least recently used layout is dropped once cache is full)
+    layout = build_layout(param, frame_sizes, label_sizes, share_keys)
+    layout_cache[key] = layout
+    if len(layout_cache) > LAYOUT_CACHE_SIZE:
+        layout_cache.popitem(last=False)
+
+
+    return layout
+def clear_layout_cache():
+    layout_cache.clear()
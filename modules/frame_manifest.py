@@ -0,0 +1,149 @@
+import os
+import json
+from PIL import Image
+from .assembly_cache import calc_file_hash
+from .logging import *
+
+
+# Constants
+FRAME_MANIFEST_FILE_NAME = "frames_manifest.json"  # Kept at the root of the folder of captured frames
+FRAME_MANIFEST_VERSION = 1  # Bump whenever fields change meaning so old manifests are ignored & the folder is scanned instead
+ROW_FLIP_FILE_NAME = "row_flip.json"  # Kept in the folder of every flipped row so flips survive a scan if the manifest is missing
+
+
+# Classes
+class ManifestRow:
+    def __init__(self):
+        self.folder:str = ""  # Folder of the row's frames relative to the manifest
+        self.label:str = ""  # Row name shown in its label
+        self.flip_h:bool = False  # Frames are flipped while assembling rather than rewritten after capturing
+        self.flip_v:bool = False
+        self.frames:list[dict] = []  # [{ "path", "width", "height", "mode", "format", "size", "mtime_ns", "hash" }, ...] (path relative to the manifest)
+
+
+# Methods
+def get_frame_manifest_path(folder_path:str):
+    return os.path.join(folder_path, FRAME_MANIFEST_FILE_NAME)
+def write_row_flip(row_folder_path:str, flip_h:bool, flip_v:bool):
+
+    # Only flipped rows get a file (Rows without one aren't flipped)
+    if not flip_h and not flip_v:
+        return
+    with open(os.path.join(row_folder_path, ROW_FLIP_FILE_NAME), 'w') as file:
+        json.dump({ "flip_h": flip_h, "flip_v": flip_v }, file)
+def read_row_flip(row_folder_path:str):  # Returns (flip h, flip v) of a scanned row
+
+    # Return if row isn't flipped
+    flip_path = os.path.join(row_folder_path, ROW_FLIP_FILE_NAME)
+    if not os.path.exists(flip_path):
+        return False, False
+
+
+    # Raise if unreadable rather than silently assembling the row unflipped
+    try:
+        with open(flip_path, 'r') as file:
+            flip = json.load(file)
+    except (OSError, ValueError) as e:
+        raise Exception(f"Failed to read row flip '{flip_path}': {e}")
+    return bool(flip.get("flip_h", False)), bool(flip.get("flip_v", False))
+def describe_frame(folder_path:str, frame_path:str, stored = None):
+
+    # Read header & file stats of a single frame (Pixels aren't decoded), size & mode are taken from stored pixels if the frame is kept in a frame store
+    stat = os.stat(frame_path)
+    if stored is not None:
+        width, height = stored.size
+        mode = stored.mode
+        img_format = stored.format
+    else:
+        with Image.open(frame_path) as img:
+            width, height = img.size
+            mode = img.mode
+            img_format = img.format
+
+
+    return {
+        "path": os.path.relpath(frame_path, folder_path).replace(os.sep, "/"),
+        "width": width,
+        "height": height,
+        "mode": mode,
+        "format": img_format,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "hash": calc_file_hash(frame_path)
+    }
+def write_frame_manifest(folder_path:str, rows:list[tuple[str, str, list[str], bool, bool]], frame_store = None):  # rows = [(row folder path, label, [frame path, ...], flip h, flip v), ...] in order
+
+    # Describe every frame right after it's captured so assembly never has to list folders or open headers again
+    manifest_rows = []
+    for row_folder_path, label, frame_paths, flip_h, flip_v in rows:
+        manifest_rows.append({
+            "folder": os.path.relpath(row_folder_path, folder_path).replace(os.sep, "/"),
+            "label": label,
+            "flip_h": flip_h,
+            "flip_v": flip_v,
+            "frames": [describe_frame(folder_path, frame_path, frame_store.get(frame_path) if frame_store is not None else None) for frame_path in frame_paths]
+        })
+
+
+    return save_frame_manifest(folder_path, manifest_rows)
+def save_frame_manifest(folder_path:str, manifest_rows:list[dict]):
+
+    # Write to a temporary file first so an interrupted write never leaves a truncated manifest behind
+    manifest_path = get_frame_manifest_path(folder_path)
+    temp_path = manifest_path + ".tmp"
+    with open(temp_path, 'w') as file:
+        json.dump({ "version": FRAME_MANIFEST_VERSION, "rows": manifest_rows }, file)
+    os.replace(temp_path, manifest_path)
+    return manifest_path
+def refresh_frame_manifest(folder_path:str):  # Returns manifest path, or None if there's no manifest to refresh
+
+    # Load manifest as is (Only the current manifest version is refreshed)
+    manifest_path = get_frame_manifest_path(folder_path)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r') as file:
+        manifest = json.load(file)
+    if manifest.get("version") != FRAME_MANIFEST_VERSION:
+        return None
+
+
+    # Describe every frame again from its file (Rows, labels & flips are kept)
+    manifest_rows = manifest.get("rows", [])
+    for manifest_row in manifest_rows:
+        manifest_row["frames"] = [describe_frame(folder_path, os.path.join(folder_path, *entry["path"].split("/"))) for entry in manifest_row["frames"]]
+
+
+    return save_frame_manifest(folder_path, manifest_rows)
+def read_frame_manifest(folder_path:str):  # Returns [ManifestRow, ...] in order, or None if there's no usable manifest
+
+    # Return if folder has no manifest
+    manifest_path = get_frame_manifest_path(folder_path)
+    if not os.path.exists(manifest_path):
+        return None
+
+
+    # Load manifest (Ignored if unreadable or from another manifest version, flips are then taken from every row's flip file)
+    try:
+        with open(manifest_path, 'r') as file:
+            manifest = json.load(file)
+    except (OSError, ValueError) as e:
+        log(f"Frame manifest '{manifest_path}' is unreadable ({e}), scanning folder instead")
+        return None
+    if manifest.get("version") != FRAME_MANIFEST_VERSION:
+        log(f"Frame manifest '{manifest_path}' is from another version, scanning folder instead")
+        return None
+
+
+    # Create rows
+    rows = []
+    for manifest_row in manifest.get("rows", []):
+        row = ManifestRow()
+        row.folder = manifest_row["folder"]
+        row.label = manifest_row["label"]
+        row.flip_h = manifest_row.get("flip_h", False)
+        row.flip_v = manifest_row.get("flip_v", False)
+        row.frames = manifest_row["frames"]
+        rows.append(row)
+
+
+    return rows
@@ -0,0 +1,175 @@
+import math
+
+
+# Constants
+ATLAS_WIDTH_FACTORS = (1.0, 1.25, 1.5, 2.0)  # Candidate atlas widths relative to the square root of the total area
+
+
+# Methods
+def find_skyline_position(skyline:list, width:int, height:int, atlas_width:int):
+
+    # Find the lowest (then left most) spot along the skyline where the rect fits
+    best_index = -1
+    best_x = 0
+    best_y = 0
+    for i in range(len(skyline)):
+
+        # Skip if rect overflows the atlas width starting from this segment
+        x = skyline[i][0]
+        if x + width > atlas_width:
+            break
+
+
+        # Rect rests on the highest segment it spans
+        y = 0
+        remaining = width
+        j = i
+        while remaining > 0:
+            y = max(y, skyline[j][1])
+            remaining -= skyline[j][2]
+            j += 1
+
+
+        # Keep if lower than the best so far
+        if best_index == -1 or y + height < best_y + height or (y + height == best_y + height and x < best_x):
+            best_index, best_x, best_y = i, x, y
+
+
+    return best_index, best_x, best_y
+def add_skyline_level(skyline:list, index:int, x:int, y:int, width:int, height:int):
+
+    # Insert new segment on top of placed rect
+    skyline.insert(index, [x, y + height, width])
+
+
+    # Shrink or remove the segments now covered by the new one
+    i = index + 1
+    while i < len(skyline):
+        seg_x, seg_y, seg_width = skyline[i]
+        overlap = (x + width) - seg_x
+        if overlap <= 0:
+            break
+
+        if overlap >= seg_width:
+            skyline.pop(i)
+            continue
+
+        skyline[i] = [seg_x + overlap, seg_y, seg_width - overlap]
+        break
+
+
+    # Merge neighbouring segments of equal height
+    i = 0
+    while i < len(skyline) - 1:
+        if skyline[i][1] == skyline[i + 1][1]:
+            skyline[i][2] += skyline[i + 1][2]
+            skyline.pop(i + 1)
+        else:
+            i += 1
+def pack_skyline(sizes:list[tuple[int, int]], atlas_width:int):
+
+    # Place tallest rects first (Ties broken by width then input order so packing is deterministic)
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0], i))
+    skyline = [[0, 0, atlas_width]]  # [[x, y, width], ...]
+    positions:list[tuple[int, int]] = [(0, 0)] * len(sizes)
+    atlas_height = 0
+    for i in order:
+        width, height = sizes[i]
+
+        # Fail if rect can't fit within the atlas width at all
+        index, x, y = find_skyline_position(skyline, width, height, atlas_width)
+        if index == -1:
+            return None, 0
+
+        add_skyline_level(skyline, index, x, y, width, height)
+        positions[i] = (x, y)
+        atlas_height = max(atlas_height, y + height)
+
+
+    return positions, atlas_height
+def pack_rects(sizes:list[tuple[int, int]], padding:int = 0):  # Returns positions of each rect, atlas width & atlas height
+
+    # Return if nothing to pack
+    if len(sizes) == 0:
+        return [], 0, 0
+
+
+    # Pad every rect on its right & bottom (Atlas is padded too so the last rects don't need trailing padding)
+    padded_sizes = [(width + padding, height + padding) for (width, height) in sizes]
+    widest = max(width for (width, _) in padded_sizes)
+    total_area = sum(width * height for (width, height) in padded_sizes)
+
+
+    # Try a few atlas widths and keep the one with the least area
+    best = None
+    for factor in ATLAS_WIDTH_FACTORS:
+        atlas_width = max(widest, int(math.ceil(math.sqrt(total_area) * factor)))
+        positions, atlas_height = pack_skyline(padded_sizes, atlas_width)
+        if positions is None:
+            continue
+
+        used_width = max(x + width for (x, _), (width, _) in zip(positions, padded_sizes))
+        if best is None or used_width * atlas_height < best[1] * best[2]:
+            best = (positions, used_width, atlas_height)
+
+
+    positions, atlas_width, atlas_height = best
+    return positions, max(0, atlas_width - padding), max(0, atlas_height - padding)
+def fill_skyline_page(sizes:list[tuple[int, int]], indices:list[int], page_width:int, page_height:int):  # Returns [(index, (x, y)), ...] of the rects that fit on the page
+
+    # Place tallest rects first & skip any that would overflow the page (Smaller rects later on may still fill the gaps)
+    order = sorted(indices, key=lambda i: (-sizes[i][1], -sizes[i][0], i))
+    skyline = [[0, 0, page_width]]  # [[x, y, width], ...]
+    placed = []
+    for i in order:
+        width, height = sizes[i]
+        index, x, y = find_skyline_position(skyline, width, height, page_width)
+        if index == -1 or y + height > page_height:
+            continue
+
+        add_skyline_level(skyline, index, x, y, width, height)
+        placed.append((i, (x, y)))
+
+
+    return placed
+def pack_pages(sizes:list[tuple[int, int]], padding:int, max_width:int, max_height:int):  # Returns [(rect indices, positions, page width, page height), ...]
+
+    # Pad every rect on its right & bottom (Page limits are padded too so the last rects don't need trailing padding)
+    padded_sizes = [(width + padding, height + padding) for (width, height) in sizes]
+    page_area = (max_width + padding) * (max_height + padding)
+    pages = []
+    remaining = list(range(len(sizes)))
+    remaining_area = sum(width * height for (width, height) in padded_sizes)
+    while True:
+
+        # Pack whatever is left onto a single page if it fits within the limits (Only tried once the rest could fit by area, so every page doesn't repack all remaining rects)
+        if remaining_area <= page_area:
+            positions, width, height = pack_rects([sizes[i] for i in remaining], padding)
+            if width <= max_width and height <= max_height:
+                pages.append((remaining, positions, width, height))
+                return pages
+
+
+        # Otherwise fill a page with as many rects as fit (A rect larger than the limits gets a page of its own)
+        placed = fill_skyline_page(padded_sizes, remaining, max_width + padding, max_height + padding)
+        if len(placed) == 0:
+            placed = [(remaining[0], (0, 0))]
+        page_indices = [i for (i, _) in placed]
+        page_positions = [position for (_, position) in placed]
+        page_width = max(x + padded_sizes[i][0] for i, (x, _) in placed) - padding
+        page_height = max(y + padded_sizes[i][1] for i, (_, y) in placed) - padding
+
+
+        # Repack page on its own in case a tighter fit is found within the limits
+        positions, width, height = pack_rects([sizes[i] for i in page_indices], padding)
+        if width <= max_width and height <= max_height and width * height < page_width * page_height:
+            page_positions, page_width, page_height = positions, width, height
+        pages.append((page_indices, page_positions, page_width, page_height))
+
+
+        # Move on to the next page
+        placed_indices = set(page_indices)
+        remaining = [i for i in remaining if i not in placed_indices]
+        remaining_area -= sum(padded_sizes[i][0] * padded_sizes[i][1] for i in page_indices)
+        if len(remaining) == 0:
+            return pages
@@ -0,0 +1,53 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Methods
+def calc_thread_count(prefetch_depth:int):
+    return max(1, min(prefetch_depth, os.cpu_count() or 1))
+def is_prefetching(prefetch_depth:int, item_count:int):
+    return prefetch_depth > 0 and item_count > 1 and (os.cpu_count() or 1) > 1  # A single core has nothing to overlap decoding with
+def prefetch(items:list, load, prefetch_depth:int):
+
+    # Load serially if prefetching is off (Nothing is loaded ahead so only the current item is ever held)
+    if(not is_prefetching(prefetch_depth, len(items))):
+        for item in items:
+            yield load(item)
+        return
+
+
+    # Keep up to prefetch depth items loading ahead on a thread pool while the current one is used (Pillow releases the GIL while decoding)
+    executor = ThreadPoolExecutor(max_workers=calc_thread_count(prefetch_depth))
+    pending = deque()
+    try:
+        next_index = 0
+        while next_index < len(items) and len(pending) < prefetch_depth:
+            pending.append(executor.submit(load, items[next_index]))
+            next_index += 1
+
+        while pending:
+            result = pending.popleft().result()
+            if next_index < len(items):
+                pending.append(executor.submit(load, items[next_index]))
+                next_index += 1
+            yield result
+    finally:
+
+        # Drop whatever was loaded ahead if stopped early (e.g. a failed paste), closing items that were already loaded
+        executor.shutdown(wait=True, cancel_futures=True)
+        for future in pending:
+            if not future.cancelled() and future.exception() is None:
+                close_item(future.result())
+def close_item(item):
+    close = getattr(item, "close", None)
+    if close is not None:
+        close()
+def map_threaded(func, items:list, prefetch_depth:int):
+
+    # Run func over every item on a thread pool keeping results in order (Serial if prefetching is off)
+    if(not is_prefetching(prefetch_depth, len(items))):
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=calc_thread_count(prefetch_depth)) as executor:
+        return list(executor.map(func, items))
@@ -0,0 +1,119 @@
+import os
+import mmap
+import shutil
+from PIL import Image
+
+
+# Constants
+FRAME_STORE_FOLDER_NAME = ".ssm_frames"  # Raw frames that don't fit in memory, kept inside the temp folder so it goes away along with it
+RAW_FILE_EXTENSION = ".raw"
+DEFAULT_MEMORY_LIMIT = 1024 * 1024 * 1024  # Bytes of raw pixels held in memory before frames spill onto disk
+STORED_MODES = ["RGBA", "RGB", "LA", "L"]  # Anything else is converted to RGBA since its raw bytes alone can't be turned back into an image
+
+
+# Classes
+class StoredFrame:  # Decoded pixels of a single frame, either held in memory or in a raw file that's memory mapped when read
+    def __init__(self, mode:str, size:tuple[int, int], file_format:str, data:bytes = None, raw_path:str = ""):
+        self.mode = mode
+        self.size = size
+        self.format = file_format  # Format of the frame's file, raw pixels have none of their own
+        self.data = data
+        self.raw_path = raw_path
+        self.mapped = None
+    def __getstate__(self):  # Mappings can't be pickled, worker processes map the raw file again on first read
+        state = self.__dict__.copy()
+        state["mapped"] = None
+        return state
+    def to_image(self):
+
+        # Map raw file on first read (Pages are only loaded as they're touched)
+        if self.data is None and self.mapped is None:
+            with open(self.raw_path, 'rb') as file:
+                self.mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+        # Wrap pixels without copying or decoding them
+        return Image.frombuffer(self.mode, self.size, self.data if self.data is not None else self.mapped, "raw", self.mode, 0, 1)
+    def release(self):
+
+        # Unmap raw file (Still mapped if an image wrapping it is alive, it's then unmapped once garbage collected)
+        if self.mapped is not None:
+            try:
+                self.mapped.close()
+            except BufferError:
+                pass
+            self.mapped = None
+class FrameStore:  # Frames passed between capture stages as raw pixels so they are decoded once & never re-encoded in between
+    def __init__(self, spill_folder_path:str, memory_limit:int = DEFAULT_MEMORY_LIMIT):
+        self.spill_folder_path = spill_folder_path
+        self.memory_limit = memory_limit
+        self.memory_used = 0
+        self.frames:dict[str, StoredFrame] = {}  # { normalized frame path: StoredFrame }
+        self.spill_count = 0
+    def get_key(self, frame_path:str):
+        return os.path.normcase(os.path.abspath(frame_path))
+    def get(self, frame_path:str):  # Returns StoredFrame of given frame, or None if it only exists on disk
+        return self.frames.get(self.get_key(frame_path))
+    def load(self, frame_path:str):
+
+        # Get stored pixels, otherwise decode the frame from disk
+        stored = self.get(frame_path)
+        if stored is not None:
+            return stored.to_image()
+        img = Image.open(frame_path)
+        img.load()
+        return img
+    def put(self, frame_path:str, img:Image.Image):
+
+        # Replace previously stored pixels (Edited pixels lose their format, so it's taken from the previous pixels or the file extension)
+        previous = self.get(frame_path)
+        file_format = img.format
+        if file_format is None:
+            file_format = previous.format if previous is not None else Image.registered_extensions().get(os.path.splitext(frame_path)[1].lower())
+        self.discard(frame_path)
+        if img.mode not in STORED_MODES:
+            img = img.convert("RGBA")
+        data = img.tobytes()
+
+
+        # Keep in memory while within limit, otherwise spill onto a raw file
+        if self.memory_used + len(data) <= self.memory_limit:
+            stored = StoredFrame(img.mode, img.size, file_format, data=data)
+            self.memory_used += len(data)
+        else:
+            os.makedirs(self.spill_folder_path, exist_ok=True)
+            raw_path = os.path.join(self.spill_folder_path, f"{self.spill_count}{RAW_FILE_EXTENSION}")
+            self.spill_count += 1
+            with open(raw_path, 'wb') as file:
+                file.write(data)
+            stored = StoredFrame(img.mode, img.size, file_format, raw_path=raw_path)
+        self.frames[self.get_key(frame_path)] = stored
+    def discard(self, frame_path:str):
+
+        # Forget stored pixels of frame (Its file on disk is used from then on)
+        stored = self.frames.pop(self.get_key(frame_path), None)
+        if stored is None:
+            return
+        if stored.data is not None:
+            self.memory_used -= len(stored.data)
+        else:
+            stored.release()
+            try:
+                os.remove(stored.raw_path)
+            except OSError:
+                pass
+    def save(self):
+
+        # Write every stored frame back onto its file (Only needed if the frames outlive the store)
+        for key, stored in self.frames.items():
+            with stored.to_image() as img:
+                img.save(key, format=stored.format)
+    def close(self):
+
+        # Drop every stored frame along with spilled raw files
+        for stored in self.frames.values():
+            stored.release()
+        self.frames.clear()
+        self.memory_used = 0
+        if os.path.exists(self.spill_folder_path):
+            shutil.rmtree(self.spill_folder_path, ignore_errors=True)
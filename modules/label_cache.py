@@ -0,0 +1,43 @@
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
+
+
+# Constants
+LABEL_CACHE_SIZE = 4096  # Rasterized labels kept per process (Each is only a small single channel mask)
+ALIASED_IMAGE_MODES = ("1", "P", "I", "F")  # Modes Pillow draws text into without anti aliasing
+
+
+# Methods
+@lru_cache(maxsize=None)
+def load_font(font_size:int):  # Loaded once per font size per process (Fonts can't be sent to worker processes, so every process loads its own)
+    return ImageFont.load_default(font_size)
+@lru_cache(maxsize=LABEL_CACHE_SIZE)
+def render_label(label_text:str, font_size:int, is_antialiased:bool = True):  # Returns mask of the label & its bounding box relative to where it's drawn
+
+    # Measure label (Aliased glyphs can be wider so they're measured in their own mode)
+    font = load_font(font_size)
+    font_mode = "L" if is_antialiased else "1"
+    label_bbox = font.getbbox(label_text, mode=font_mode)
+    mask_width = max(0, label_bbox[2] - label_bbox[0])
+    mask_height = max(0, label_bbox[3] - label_bbox[1])
+
+
+    # Rasterize label into its own mask (Color is applied when pasting so every color shares the same mask)
+    mask = Image.new("L", (mask_width, mask_height), 0)
+    draw = ImageDraw.Draw(mask)
+    draw.fontmode = font_mode
+    draw.text((-label_bbox[0], -label_bbox[1]), label_text, fill=255, font=font, spacing = 0)
+
+
+    return mask, label_bbox
+@lru_cache(maxsize=LABEL_CACHE_SIZE)
+def measure_label(label_text:str, font_size:int):
+    return load_font(font_size).getbbox(label_text)
+def draw_label(image, label_text:str, font_size:int, position:tuple[int, int], fill):
+
+    # Paste label color through its cached mask (Same pixels as drawing the text directly)
+    mask, label_bbox = render_label(label_text, font_size, image.mode not in ALIASED_IMAGE_MODES)
+    if mask.width == 0 or mask.height == 0:
+        return
+
+    image.paste(fill, (int(position[0] + label_bbox[0]), int(position[1] + label_bbox[1])), mask)
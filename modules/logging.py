@@ -1,4 +1,3 @@
-import bpy
 from datetime import datetime
 
 
@@ -7,4 +6,8 @@ def log(message, show_popup = False, icon="INFO"):
     print(f"[SpriteSheetMaker {datetime.now()}] {message}")
 
     if(show_popup):
+        try:
+            import bpy  # Imported only when needed so worker processes & the command line can log without Blender
+        except ImportError:
+            return
         bpy.ops.spritesheetmaker.message_popup('INVOKE_DEFAULT', **{ "message_heading": message,  "message_icon" : icon })
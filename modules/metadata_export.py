@@ -0,0 +1,179 @@
+import os
+import json
+from enum import Enum
+
+
+# Enums
+class MetadataFormat(Enum):
+    NONE = "None"
+    JSON_ARRAY = "JSON Array"
+    JSON_HASH = "JSON Hash"
+    GODOT = "Godot SpriteFrames"
+    UNITY = "Unity Sprites"
+
+
+# Constants
+METADATA_EXTENSIONS = {
+    MetadataFormat.JSON_ARRAY: ".json",
+    MetadataFormat.JSON_HASH: ".json",
+    MetadataFormat.GODOT: ".tres",
+    MetadataFormat.UNITY: ".unity.json"
+}
+PIVOT_DECIMALS = 4
+UNITY_CUSTOM_ALIGNMENT = 9  # SpriteAlignment.Custom, pivot is taken as is
+
+
+# Classes
+class FrameRecord:  # Everything engines need about a single frame, taken from the layout (No pixels are read)
+    def __init__(self):
+        self.row:int = 0
+        self.page:int = 0  # Index of the image the frame is on (Always 0 unless output is split across pages)
+        self.row_name:str = ""  # Row label without frame count & row size, made unique so frame & animation names never repeat
+        self.index:int = 0  # Index of frame within its row
+        self.cell_index:int = 0  # Frames sharing a deduplicated cell share the same index
+        self.cell:tuple[int, int, int, int] = (0, 0, 0, 0)  # x, y, width, height of the frame's cell within the image
+        self.sprite:tuple[int, int, int, int] = (0, 0, 0, 0)  # x, y, width, height of the frame's pasted pixels within the image
+        self.source_size:tuple[int, int] = (0, 0)  # Size of the rendered frame before trimming
+        self.trim_offset:tuple[int, int] = (0, 0)  # Top left of the kept area within the rendered frame
+        self.pivot:tuple[float, float] = (0.5, 0.5)  # Normalized within the cell, top left origin
+        self.duration:int = 0  # Milliseconds
+    @property
+    def name(self):
+        return f"{self.row_name}_{self.index}"
+
+
+# Methods
+def calc_unique_row_names(row_names:list[str]):
+
+    # Rows sharing a label get a number appended (Walk, Walk_2, ...) so no two frames end up with the same name
+    unique_names = []
+    taken = set(row_names)
+    counts = {}  # { row name: times seen }
+    for row_name in row_names:
+        counts[row_name] = counts.get(row_name, 0) + 1
+        unique_name = row_name
+        if(counts[row_name] > 1):
+            suffix = counts[row_name]
+            while(f"{row_name}_{suffix}" in taken):
+                suffix += 1
+            unique_name = f"{row_name}_{suffix}"
+            taken.add(unique_name)
+            counts[row_name] = suffix
+        unique_names.append(unique_name)
+
+
+    return unique_names
+def group_by_row(records:list[FrameRecord]):
+
+    # Get frames of every row in order
+    rows = {}  # { row: (row_name, [FrameRecord, ...]) }
+    for record in records:
+        rows.setdefault(record.row, (record.row_name, []))[1].append(record)
+
+
+    return [rows[row] for row in sorted(rows)]
+def build_generic_frame(record:FrameRecord):
+
+    # TexturePacker style frame (Source size is the cell so engines can restore alignment from the sprite offset)
+    sprite_x, sprite_y, sprite_width, sprite_height = record.sprite
+    cell_x, cell_y, cell_width, cell_height = record.cell
+    return {
+        "frame": { "x": sprite_x, "y": sprite_y, "w": sprite_width, "h": sprite_height },
+        "rotated": False,
+        "trimmed": (sprite_width, sprite_height) != (cell_width, cell_height),
+        "spriteSourceSize": { "x": sprite_x - cell_x, "y": sprite_y - cell_y, "w": sprite_width, "h": sprite_height },
+        "sourceSize": { "w": cell_width, "h": cell_height },
+        "pivot": { "x": record.pivot[0], "y": record.pivot[1] },
+        "duration": record.duration,
+        "page": record.page,
+        "row": record.row,
+        "index": record.index,
+        "originalSize": { "w": record.source_size[0], "h": record.source_size[1] },
+        "originalOffset": { "x": record.trim_offset[0], "y": record.trim_offset[1] }
+    }
+def build_generic_meta(records:list[FrameRecord], pages:list[tuple[str, tuple[int, int]]]):
+
+    # Row of frames become a tag (Frames are listed row after row so every row is a continuous range)
+    frame_tags = []
+    first_frame = 0
+    for row_name, row_records in group_by_row(records):
+        frame_tags.append({ "name": row_name, "from": first_frame, "to": first_frame + len(row_records) - 1, "direction": "forward" })
+        first_frame += len(row_records)
+
+
+    # First page is also listed as the image so single page readers keep working
+    image_name, image_size = pages[0]
+    return {
+        "image": image_name,
+        "size": { "w": image_size[0], "h": image_size[1] },
+        "pages": [{ "image": page_name, "size": { "w": page_size[0], "h": page_size[1] } } for page_name, page_size in pages],
+        "scale": "1",
+        "frameTags": frame_tags
+    }
+def export_json_array(records:list[FrameRecord], pages:list[tuple[str, tuple[int, int]]], frame_rate:float):
+    frames = [dict(filename=record.name, **build_generic_frame(record)) for record in records]
+    return json.dumps({ "frames": frames, "meta": build_generic_meta(records, pages) }, indent=4)
+def export_json_hash(records:list[FrameRecord], pages:list[tuple[str, tuple[int, int]]], frame_rate:float):
+    frames = { record.name: build_generic_frame(record) for record in records }
+    return json.dumps({ "frames": frames, "meta": build_generic_meta(records, pages) }, indent=4)
+def export_godot(records:list[FrameRecord], pages:list[tuple[str, tuple[int, int]]], frame_rate:float):
+
+    # One texture per page (Ids start from 1)
+    cell_records = {}  # { cell index: record }
+    for record in records:
+        cell_records.setdefault(record.cell_index, record)
+    lines = [f"[gd_resource type=\"SpriteFrames\" load_steps={len(cell_records) + len(pages) + 1} format=3]", ""]
+    for page, (page_name, _) in enumerate(pages):
+        lines.append(f"[ext_resource type=\"Texture2D\" path=\"{page_name}\" id=\"{page + 1}\"]")
+    lines.append("")
+
+
+    # One AtlasTexture per cell (Whole cell is used as region so every frame keeps its alignment)
+    for cell_index, record in cell_records.items():
+        cell_x, cell_y, cell_width, cell_height = record.cell
+        lines += [f"[sub_resource type=\"AtlasTexture\" id=\"AtlasTexture_{cell_index}\"]", f"atlas = ExtResource(\"{record.page + 1}\")", f"region = Rect2({cell_x}, {cell_y}, {cell_width}, {cell_height})", ""]
+
+
+    # One animation per row
+    animations = []
+    for row_name, row_records in group_by_row(records):
+        frames = ", ".join(f"{{\n\"duration\": 1.0,\n\"texture\": SubResource(\"AtlasTexture_{record.cell_index}\")\n}}" for record in row_records)
+        animations.append(f"{{\n\"frames\": [{frames}],\n\"loop\": true,\n\"name\": &{json.dumps(row_name)},\n\"speed\": {float(frame_rate)}\n}}")
+    lines += ["[resource]", f"animations = [{', '.join(animations)}]", ""]
+
+
+    return "\n".join(lines)
+def export_unity(records:list[FrameRecord], pages:list[tuple[str, tuple[int, int]]], frame_rate:float):
+
+    # Unity rects & pivots start from the bottom left of the page
+    sprites = []
+    for record in records:
+        cell_x, cell_y, cell_width, cell_height = record.cell
+        page_height = pages[record.page][1][1]
+        sprites.append({
+            "name": record.name,
+            "page": record.page,
+            "rect": { "x": cell_x, "y": page_height - cell_y - cell_height, "width": cell_width, "height": cell_height },
+            "alignment": UNITY_CUSTOM_ALIGNMENT,
+            "pivot": { "x": record.pivot[0], "y": round(1.0 - record.pivot[1], PIVOT_DECIMALS) },
+            "border": { "x": 0, "y": 0, "z": 0, "w": 0 }
+        })
+
+
+    # Row of frames become an animation clip
+    animations = [{ "name": row_name, "frameRate": frame_rate, "sprites": [record.name for record in row_records] } for row_name, row_records in group_by_row(records)]
+    image_name, image_size = pages[0]
+    textures = [{ "texture": page_name, "size": { "width": page_size[0], "height": page_size[1] } } for page_name, page_size in pages]
+    return json.dumps({ "texture": image_name, "size": { "width": image_size[0], "height": image_size[1] }, "textures": textures, "sprites": sprites, "animations": animations }, indent=4)
+def export_metadata(metadata_format:MetadataFormat, records:list[FrameRecord], output_path:str, page_images:list[tuple[str, tuple[int, int]]], frame_rate:float):  # Returns path of saved metadata
+
+    # Save metadata in given format next to the output (A single file covers every page)
+    metadata_path = os.path.splitext(output_path)[0] + METADATA_EXTENSIONS[metadata_format]
+    pages = [(os.path.basename(page_path), page_size) for page_path, page_size in page_images]
+    exporters = { MetadataFormat.JSON_ARRAY: export_json_array, MetadataFormat.JSON_HASH: export_json_hash, MetadataFormat.GODOT: export_godot, MetadataFormat.UNITY: export_unity }
+    metadata = exporters[metadata_format](records, pages, frame_rate)
+    with open(metadata_path, 'w') as file:
+        file.write(metadata)
+
+
+    return metadata_path
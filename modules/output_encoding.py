@@ -0,0 +1,57 @@
+import os
+import time
+import zlib
+from enum import Enum
+from .logging import *
+
+
+# Enums
+class EncoderProfile(Enum):
+    FAST = "Fast"
+    BALANCED = "Balanced"
+    SMALLEST = "Smallest"
+class OutputFormat(Enum):
+    AUTO = "Auto"  # Keep format of the given output path (Or of the frames for strips & images)
+    PNG = "PNG"
+    WEBP = "WEBP"
+
+
+# Constants
+OUTPUT_FORMAT_EXTENSIONS = { OutputFormat.PNG: ".png", OutputFormat.WEBP: ".webp" }
+ENCODER_SAVE_OPTIONS = {  # { file extension: { profile: Pillow save options } } (Formats not listed are saved with Pillow defaults)
+    ".png": {  # Default strategy compresses mostly transparent sheets far better than the filtered one Pillow uses
+        EncoderProfile.FAST: { "compress_level": 1 },
+        EncoderProfile.BALANCED: {},  # Pillow defaults
+        EncoderProfile.SMALLEST: { "optimize": True, "compress_type": zlib.Z_DEFAULT_STRATEGY }  # Optimize also forces the highest compress level
+    },
+    ".webp": {  # Always lossless (Exact keeps color of fully transparent pixels so nothing about the sprites changes)
+        EncoderProfile.FAST: { "lossless": True, "exact": True, "method": 0, "quality": 0 },
+        EncoderProfile.BALANCED: { "lossless": True, "exact": True, "method": 4, "quality": 80 },
+        EncoderProfile.SMALLEST: { "lossless": True, "exact": True, "method": 6, "quality": 100 }
+    }
+}
+STREAM_COMPRESS_OPTIONS = {  # { profile: (compress level, zlib strategy) } used when streaming png bands
+    EncoderProfile.FAST: (1, zlib.Z_DEFAULT_STRATEGY),
+    EncoderProfile.BALANCED: (6, zlib.Z_DEFAULT_STRATEGY),
+    EncoderProfile.SMALLEST: (9, zlib.Z_DEFAULT_STRATEGY)
+}
+
+
+# Methods
+def apply_output_format(output_format:OutputFormat, output_path:str):
+
+    # Swap extension of output path to the requested format
+    if(output_format == OutputFormat.AUTO):
+        return output_path
+
+    return os.path.splitext(output_path)[0] + OUTPUT_FORMAT_EXTENSIONS[output_format]
+def get_save_options(profile:EncoderProfile, output_path:str):
+    ext = os.path.splitext(output_path)[1].lower()
+    return dict(ENCODER_SAVE_OPTIONS.get(ext, {}).get(profile, {}))
+def save_image(image, output_path:str, profile:EncoderProfile = EncoderProfile.BALANCED):
+
+    # Encode with the options of given profile & log how long it took
+    start_time = time.perf_counter()
+    image.save(output_path, **get_save_options(profile, output_path))
+    elapsed_time = time.perf_counter() - start_time
+    log(f"Encoded '{os.path.basename(output_path)}' with {profile.value} profile in {elapsed_time:.3f}s ({os.path.getsize(output_path)} bytes)")
@@ -0,0 +1,69 @@
+from PIL import Image
+try:
+    import numpy as np
+except ImportError:  # Only required for indexed output
+    np = None
+from .logging import *
+
+
+# Constants
+MAX_PALETTE_COLORS = 256
+PALETTE_MODE = "RGBA"  # Palette alpha is written into the png as tRNS
+
+
+# Methods
+def pack_colors(pixels):
+
+    # Pack every RGBA pixel into a single int (Little endian packing makes alpha the most significant byte, so sorting puts transparent colors first & keeps tRNS short)
+    return np.ascontiguousarray(pixels, dtype=np.uint8).view("<u4").reshape(pixels.shape[:-1])
+def unpack_colors(packed):
+    return np.ascontiguousarray(packed, dtype="<u4").view(np.uint8).reshape(-1, 4)
+def build_palette(pixels):  # Returns sorted palette of packed colors & palette index of every pixel, or None if more than MAX_PALETTE_COLORS colors are used
+
+    # Get every unique color (Sorted so the same colors always get the same indices no matter which rows use them)
+    palette, indices = np.unique(pack_colors(pixels).reshape(-1), return_inverse=True)
+    if len(palette) > MAX_PALETTE_COLORS:
+        return None
+
+
+    return palette, indices.reshape(pixels.shape[:-1])
+def quantize_palette(image):
+
+    # Reduce colors with Pillow then sort the resulting palette so indices are as stable as possible
+    quantized = image.quantize(MAX_PALETTE_COLORS, method=Image.Quantize.FASTOCTREE)
+    palette_colors = np.frombuffer(bytes(quantized.getpalette(PALETTE_MODE)), dtype=np.uint8).reshape(-1, 4)
+    packed_palette = pack_colors(palette_colors)
+    order = np.argsort(packed_palette, kind="stable")
+    remap = np.empty_like(order)
+    remap[order] = np.arange(len(order))
+    indices = remap[np.asarray(quantized)]
+
+
+    return packed_palette[order], indices
+def to_indexed_image(image):  # Returns a P mode copy of image sharing one palette across all its pixels, or None if not possible
+
+    # Skip if NumPy isn't available
+    if np is None:
+        log("NumPy is not installed, indexed output skipped")
+        return None
+
+
+    # Fully transparent pixels all become the same color (Their color is invisible & would only waste palette entries)
+    pixels = np.array(image.convert(PALETTE_MODE))
+    pixels[pixels[..., 3] == 0] = 0
+
+
+    # Use exact colors if they fit, otherwise fall back to quantizing
+    result = build_palette(pixels)
+    if result is None:
+        log(f"More than {MAX_PALETTE_COLORS} colors used, quantizing indexed output (Colors may change slightly)")
+        pixels_image = Image.fromarray(pixels, PALETTE_MODE)
+        result = quantize_palette(pixels_image)
+    palette, indices = result
+
+
+    # Create indexed image
+    indexed = Image.fromarray(indices.astype(np.uint8), "P")
+    indexed.putpalette(unpack_colors(palette).tobytes(), PALETTE_MODE)
+    log(f"Indexed output uses {len(palette)} palette colors")
+    return indexed
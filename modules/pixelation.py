@@ -0,0 +1,271 @@
+from enum import Enum
+from PIL import Image
+try:
+    import numpy as np
+except ImportError:  # Only required by the NumPy pixelate engine
+    np = None
+try:
+    import PyOpenColorIO as ocio
+except ImportError:  # Bundled with Blender, only required to apply the pixelate scene's view transform with the NumPy engine
+    ocio = None
+from .logging import *
+
+
+# Enums
+class PixelateEngine(Enum):
+    COMPOSITOR = "Compositor"
+    NUMPY = "NumPy"
+class PaletteScope(Enum):
+    FRAME = "Frame"  # Every frame keeps its own colors
+    ROW = "Row"  # Frames of a row share one palette
+    SHEET = "Sheet"  # Frames of every row using this scope share one palette
+
+
+# Constants
+PIXELATE_MODE = "RGBA"
+PIXELATE_BATCH_PIXELS = 1 << 22  # Source pixels decoded & pixelated at once, frames of the same size are stacked up to this
+COMPARE_EPSILON = 0.001  # Tolerance of the compositor's compare nodes
+MAX_CHANNEL_VALUE = 255
+MIN_PIXELATED_SIZE = 4  # Smallest render resolution Blender allows, so the compositor never shrinks below it
+PALETTE_SAMPLE_PIXELS = 1 << 18  # Visible pixels sampled across all frames to build a shared palette
+PALETTE_MAP_CHUNK = 4096  # Unique colors matched against the palette at once
+
+
+# Methods
+def srgb_to_linear(values):
+    return np.where(values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4)
+def linear_to_srgb(values):
+    values = np.clip(values, 0.0, 1.0)
+    return np.where(values <= 0.0031308, values * 12.92, 1.055 * values ** (1.0 / 2.4) - 0.055)
+def create_view_transform(config_path:str, display:str, view:str, look:str = "None", exposure:float = 0.0, gamma:float = 1.0):  # Returns function turning straight linear colors into display colors the way Blender saves them with the given view settings
+
+    # Raise if OpenColorIO isn't available
+    if ocio is None:
+        raise Exception("PyOpenColorIO is not installed, view transforms can only be applied from within Blender")
+
+
+    # Build processor from scene linear through the view onto the display (Look replaces the view's own looks, same as Blender)
+    config = ocio.Config.CreateFromFile(config_path)
+    pipeline = ocio.LegacyViewingPipeline()
+    pipeline.setDisplayViewTransform(ocio.DisplayViewTransform(src=ocio.ROLE_SCENE_LINEAR, display=display, view=view))
+    if look != "None":
+        pipeline.setLooksOverride(look)
+        pipeline.setLooksOverrideEnabled(True)
+    processor = pipeline.getProcessor(config).getDefaultCPUProcessor()
+
+
+    # Exposure scales linear colors before the view, gamma is applied to display colors after it
+    def apply(rgb):
+        display_rgb = np.ascontiguousarray((rgb * 2.0 ** exposure).reshape(-1, 3), dtype=np.float32)
+        processor.applyRGB(display_rgb)
+        display_rgb = np.clip(display_rgb.reshape(rgb.shape), 0.0, 1.0)
+        return display_rgb ** (1.0 / gamma) if gamma != 1.0 else display_rgb
+    return apply
+def calc_pixelated_size(size:tuple[int, int], pixelation_amount:float):
+    width, height = size
+    return (max(MIN_PIXELATED_SIZE, int(width * (1.0 - pixelation_amount))), max(MIN_PIXELATED_SIZE, int(height * (1.0 - pixelation_amount))))
+def calc_nearest_indices(size:int, new_size:int):
+
+    # Pixel sampled by every output pixel along one axis, counted from the bottom (Same as the compositor's nearest scale, which centers both domains on a whole pixel & takes the lower pixel on ties)
+    indices = np.arange(new_size, dtype=np.int64)
+    numerator = (2 * indices + 1 - 2 * (new_size // 2)) * size + size * new_size
+    return (numerator - 1) // (2 * new_size)
+def shrink_nearest(pixels, size:tuple[int, int]):
+
+    # Sample every output pixel (Rows are flipped around since the compositor counts them from the bottom)
+    height, width = pixels.shape[-3:-1]
+    new_width, new_height = size
+    xs = calc_nearest_indices(width, new_width)
+    ys = (height - 1 - calc_nearest_indices(height, new_height))[::-1]
+    return pixels[..., ys[:, None], xs[None, :], :]
+def step_alpha(alpha, alpha_step:float):
+
+    # Round alpha up to the nearest multiple of step in single precision, same as the compositor's FloatStep group (Left as is if step is 0)
+    if abs(alpha_step) <= COMPARE_EPSILON:
+        return alpha
+    step = np.float32(alpha_step)
+    return np.ceil(alpha / step) * step
+def pixelate_pixels(pixels, param, view_transform = None):  # pixels = uint8 array of shape (..., height, width, 4), returns pixelated uint8 array of same leading shape, view_transform = function from create_view_transform (None = Standard)
+
+    # Shrink down to pixelated size
+    height, width = pixels.shape[-3:-1]
+    pixels = shrink_nearest(pixels, calc_pixelated_size((width, height), param.pixelation_amount))
+
+
+    # Quantize brightness (HSV value) of premultiplied linear colors while keeping hue & saturation, same as the compositor's node tree
+    lut = srgb_to_linear(np.arange(MAX_CHANNEL_VALUE + 1, dtype=np.float32) / MAX_CHANNEL_VALUE).astype(np.float32)
+    alpha = pixels[..., 3].astype(np.float32) * np.float32(1.0 / MAX_CHANNEL_VALUE)  # Multiplied by 1 / 255 like Blender does rather than divided, so stepped alpha lands on the same side
+    rgb = lut[pixels[..., :3]] * alpha[..., None]
+    value = rgb.max(axis=-1)
+    stepped_value = np.floor(value * param.color_amount + 0.5) / param.color_amount if param.color_amount > 0 else np.zeros_like(value)
+    value_scale = np.divide(stepped_value, value, out=np.zeros_like(value), where=value > 0)
+    rgb = rgb * value_scale[..., None]
+
+
+    # Step alpha then discard anything below min alpha
+    alpha = step_alpha(alpha, param.alpha_step)
+    is_kept = (alpha > param.min_alpha) | (np.abs(alpha - param.min_alpha) <= COMPARE_EPSILON)
+    alpha = np.clip(np.where(is_kept, alpha, 0.0), 0.0, 1.0)
+
+
+    # Convert back to straight display bytes through the view transform (Divided by the new alpha & rounded without float error the same way the compositor's output is saved)
+    rgb = np.divide(rgb, alpha[..., None], out=np.zeros_like(rgb), where=alpha[..., None] > 0)
+    rgb = view_transform(rgb) if view_transform is not None else linear_to_srgb(rgb)
+    result = np.empty(pixels.shape, dtype=np.uint8)
+    result[..., :3] = np.floor(rgb.astype(np.float64) * MAX_CHANNEL_VALUE + 0.5)
+    result[..., 3] = np.floor(alpha.astype(np.float64) * MAX_CHANNEL_VALUE + 0.5)
+    return result
+def pixelate_frames(images:list, param, view_transform = None):  # Returns pixelated copy of every image in the same order
+
+    # Raise if NumPy isn't available
+    if np is None:
+        raise Exception("NumPy is not installed, use the Compositor pixelate engine instead")
+
+
+    # Group images of the same size so each group is pixelated as one batch
+    groups = {}  # { size: [index, ...] }
+    for i, img in enumerate(images):
+        groups.setdefault(img.size, []).append(i)
+
+
+    # Pixelate every group a batch at a time (Images without alpha get their mode back so they can still be saved as is)
+    results = [None] * len(images)
+    for (width, height), indices in groups.items():
+        batch_size = max(1, PIXELATE_BATCH_PIXELS // (width * height))
+        for first in range(0, len(indices), batch_size):
+            batch_indices = indices[first:first + batch_size]
+            batch = np.stack([np.asarray(images[i].convert(PIXELATE_MODE)) for i in batch_indices])
+            for i, pixels in zip(batch_indices, pixelate_pixels(batch, param, view_transform)):
+                result = Image.fromarray(pixels, PIXELATE_MODE)
+                results[i] = result if images[i].mode in ["RGBA", "LA", "PA"] else result.convert(images[i].mode)
+
+
+    return results
+def get_frame_size(frame_path:str, frame_store = None):
+    stored = frame_store.get(frame_path) if frame_store is not None else None
+    if stored is not None:
+        return stored.size
+    with Image.open(frame_path) as img:
+        return img.size
+def pixelate_files(image_paths:dict[str, str], param, frame_store = None, view_transform = None):  # image_paths = { "input/path/to/image.png" : "output/path/to/image.png" }
+
+    # Split frames into batches of up to PIXELATE_BATCH_PIXELS so only a few are decoded at once
+    batches = []
+    batch_pixels = 0
+    for input_path in image_paths:
+        width, height = get_frame_size(input_path, frame_store)
+        if len(batches) == 0 or batch_pixels + width * height > PIXELATE_BATCH_PIXELS:
+            batches.append([])
+            batch_pixels = 0
+        batches[-1].append(input_path)
+        batch_pixels += width * height
+
+
+    # Pixelate every batch (Frames are taken from the frame store if they're kept there)
+    for batch_paths in batches:
+        log(f"Pixelating {len(batch_paths)} frames starting from '{batch_paths[0]}'")
+        images = [frame_store.load(path) if frame_store is not None else Image.open(path) for path in batch_paths]
+
+
+        # Keep pixelated frames in the frame store when overwriting stored frames, otherwise save them to their output path
+        for input_path, pixelated in zip(batch_paths, pixelate_frames(images, param, view_transform)):
+            output_path = image_paths[input_path]
+            output_path = output_path if (output_path != "" and output_path != None) else input_path
+            if frame_store is not None and output_path == input_path:
+                frame_store.put(output_path, pixelated)
+            else:
+                pixelated.save(output_path)
+            log(f"Pixelated to '{output_path}'")
+        for img in images:
+            img.close()
+def pack_rgb(rgb):
+    rgb = rgb.astype(np.uint32)
+    return (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+def unpack_rgb(packed):
+    return np.stack([(packed >> 16) & 0xFF, (packed >> 8) & 0xFF, packed & 0xFF], axis=-1).astype(np.uint8)
+def sample_visible_colors(img, sample_count:int):
+
+    # Take evenly spaced visible pixels (Same frames always give the same samples so palettes are deterministic)
+    pixels = np.asarray(img.convert(PIXELATE_MODE))
+    visible = pixels[pixels[..., 3] > 0][:, :3]
+    stride = max(1, len(visible) // max(1, sample_count))
+    return visible[::stride]
+def median_cut(colors, weights, palette_size:int):  # colors = unique (N, 3) uint8 colors, weights = pixel count of each, returns (K, 3) uint8 palette
+
+    # Keep splitting the box with most weight spread across its widest channel at its weighted median
+    def score(box):
+        box_colors = colors[box]
+        return int((box_colors.max(axis=0).astype(np.int32) - box_colors.min(axis=0)).max()) * int(weights[box].sum())
+    boxes = [np.arange(len(colors))]
+    scores = [score(boxes[0]) if len(colors) > 1 else 0]
+    while len(boxes) < palette_size:
+
+        # Stop once no box has more than one color left
+        i = int(np.argmax(scores))
+        if scores[i] == 0:
+            break
+        box = boxes.pop(i)
+        scores.pop(i)
+
+
+        # Split along widest channel so both halves hold about the same number of pixels
+        box_colors = colors[box]
+        channel = int((box_colors.max(axis=0).astype(np.int32) - box_colors.min(axis=0)).argmax())
+        order = box[np.argsort(box_colors[:, channel], kind="stable")]
+        cumulative = np.cumsum(weights[order])
+        split = min(max(1, int(np.searchsorted(cumulative, cumulative[-1] / 2))), len(order) - 1)
+        for half in (order[:split], order[split:]):
+            boxes.append(half)
+            scores.append(score(half) if len(half) > 1 else 0)
+
+
+    # Every box becomes the weighted average of its colors
+    return np.array([np.round(np.average(colors[box], axis=0, weights=weights[box])) for box in boxes], dtype=np.uint8)
+def map_to_palette(img, palette):
+
+    # Match every unique visible color to its nearest palette color once, so equal colors map the same way in every frame
+    pixels = np.array(img.convert(PIXELATE_MODE))
+    visible = pixels[..., 3] > 0
+    colors, inverse = np.unique(pack_rgb(pixels[visible][:, :3]), return_inverse=True)
+    colors = unpack_rgb(colors).astype(np.int32)
+    nearest = np.empty(len(colors), dtype=np.intp)
+    for first in range(0, len(colors), PALETTE_MAP_CHUNK):
+        chunk = colors[first:first + PALETTE_MAP_CHUNK]
+        nearest[first:first + PALETTE_MAP_CHUNK] = ((chunk[:, None, :] - palette[None, :, :].astype(np.int32)) ** 2).sum(axis=-1).argmin(axis=1)
+
+
+    # Replace colors (Alpha is left as is)
+    pixels[visible, :3] = palette[nearest[inverse.reshape(-1)]]
+    result = Image.fromarray(pixels, PIXELATE_MODE)
+    return result if img.mode in ["RGBA", "LA", "PA"] else result.convert(img.mode)
+def quantize_frames_to_palette(frame_paths:list[str], palette_size:int, frame_store = None):
+
+    # Raise if NumPy isn't available
+    if np is None:
+        raise Exception("NumPy is not installed, palettes can't be shared across frames")
+
+
+    # Build one palette from all frames (Frames are loaded one at a time so only samples are held)
+    log(f"Building {palette_size} color palette shared by {len(frame_paths)} frames")
+    samples = []
+    sample_count = max(1, PALETTE_SAMPLE_PIXELS // max(1, len(frame_paths)))
+    for frame_path in frame_paths:
+        with (frame_store.load(frame_path) if frame_store is not None else Image.open(frame_path)) as img:
+            samples.append(sample_visible_colors(img, sample_count))
+    samples = np.concatenate(samples + [np.zeros((0, 3), dtype=np.uint8)])
+    if len(samples) == 0:
+        log("Frames have no visible pixels, palette skipped")
+        return
+    colors, weights = np.unique(pack_rgb(samples), return_counts=True)
+    palette = median_cut(unpack_rgb(colors), weights, palette_size)
+
+
+    # Map every frame onto the palette (Kept in the frame store if there's one, otherwise saved back)
+    for frame_path in frame_paths:
+        with (frame_store.load(frame_path) if frame_store is not None else Image.open(frame_path)) as img:
+            mapped = map_to_palette(img, palette)
+        if frame_store is not None:
+            frame_store.put(frame_path, mapped)
+        else:
+            mapped.save(frame_path)
+    log(f"Mapped {len(frame_paths)} frames onto {len(palette)} palette colors")
@@ -0,0 +1,111 @@
+import os
+import zlib
+import struct
+
+
+# Constants
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_COLOR_TYPES = { "L": 0, "RGB": 2, "LA": 4, "RGBA": 6 }  # Pillow mode: PNG color type (8 bits per channel)
+PNG_BIT_DEPTH = 8
+PNG_FILTER_NONE = b"\x00"
+IDAT_CHUNK_SIZE = 1 << 20  # Compressed bytes buffered before an IDAT chunk is written
+DEFAULT_COMPRESS_LEVEL = 6
+TEMP_SUFFIX = ".part"  # Appended to the output path while writing, the finished png is renamed into place
+
+
+# Classes
+class PngStreamWriter:
+    def __init__(self, file_path:str, width:int, height:int, mode:str, compress_level:int = DEFAULT_COMPRESS_LEVEL, compress_strategy:int = zlib.Z_DEFAULT_STRATEGY):
+
+        # Raise if mode can't be written as 8 bit png
+        if mode not in PNG_COLOR_TYPES:
+            raise Exception(f"Image mode '{mode}' is not supported by PngStreamWriter")
+
+
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(compress_level, zlib.DEFLATED, zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL, compress_strategy)
+        self._pending = []  # Compressed bytes not yet written as IDAT
+        self._pending_size = 0
+        self.file_path = file_path
+        self.temp_path = file_path + TEMP_SUFFIX
+        self._file = open(self.temp_path, "wb")
+
+
+        # Write signature & header
+        try:
+            self._file.write(PNG_SIGNATURE)
+            self.write_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, PNG_BIT_DEPTH, PNG_COLOR_TYPES[mode], 0, 0, 0))
+        except Exception:
+            self.discard()
+            raise
+    def __enter__(self):
+        return self
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+
+        # Only finish file if nothing failed, otherwise drop the partial file
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+    def write_chunk(self, chunk_type:bytes, data:bytes):
+        self._file.write(struct.pack(">I", len(data)))
+        self._file.write(chunk_type)
+        self._file.write(data)
+        self._file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(chunk_type)) & 0xFFFFFFFF))
+    def queue(self, data:bytes):
+
+        # Buffer compressed data & flush it as an IDAT chunk once big enough
+        if not data:
+            return
+
+        self._pending.append(data)
+        self._pending_size += len(data)
+        if self._pending_size >= IDAT_CHUNK_SIZE:
+            self.flush_pending()
+    def flush_pending(self):
+        if self._pending_size == 0:
+            return
+
+        self.write_chunk(b"IDAT", b"".join(self._pending))
+        self._pending = []
+        self._pending_size = 0
+    def write_band(self, band):
+
+        # Raise if band doesn't match the image being written
+        if band.mode != self.mode or band.width != self.width:
+            raise Exception(f"Band {band.width}px '{band.mode}' does not match png {self.width}px '{self.mode}'")
+        if self.rows_written + band.height > self.height:
+            raise Exception(f"Band of {band.height} rows overflows png height {self.height}")
+
+
+        # Compress every scanline prefixed with its filter type
+        raw = band.tobytes()
+        row_size = len(raw) // band.height if band.height != 0 else 0
+        for y in range(band.height):
+            self.queue(self._compressor.compress(PNG_FILTER_NONE + raw[y * row_size:(y + 1) * row_size]))
+        self.rows_written += band.height
+    def close(self):
+
+        # Raise if not every row has been written
+        if self.rows_written != self.height:
+            self.discard()
+            raise Exception(f"Only {self.rows_written} of {self.height} png rows were written")
+
+
+        # Write remaining data & end of file, then move it over the output path
+        try:
+            self.queue(self._compressor.flush())
+            self.flush_pending()
+            self.write_chunk(b"IEND", b"")
+            self._file.close()
+            os.replace(self.temp_path, self.file_path)
+        except Exception:
+            self.discard()
+            raise
+    def discard(self):
+        self._file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
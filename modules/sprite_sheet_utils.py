@@ -4,9 +4,18 @@ import shutil
 import weakref
 import traceback
 import math
+from array import array
+try:
+    import numpy as np
+except ImportError:  # Only speeds up handing stored frames over to the compositor
+    np = None
 from mathutils import Vector, Matrix
 from enum import Enum
-from .combine_frames import AssembleParam, assemble_images, create_folder, flip_image
+from PIL import Image
+from .combine_frames import AssembleParam, assemble_images, create_folder
+from .frame_manifest import write_frame_manifest, refresh_frame_manifest, write_row_flip
+from .frame_store import FrameStore, FRAME_STORE_FOLDER_NAME
+from .pixelation import PixelateEngine, PaletteScope, pixelate_files, quantize_frames_to_palette, calc_pixelated_size, create_view_transform
 from .logging import *
 
 
@@ -74,7 +83,10 @@ class PixelateParam:
         self.pixelation_amount:float = 0.9
         self.color_amount:float = 50.0
         self.min_alpha:float = 0.0
-        self.alpha_step:float = 0.25  # Ensures alpha of color is rounded down to the nearest multiple of "step" (helps reducing gradients)
+        self.alpha_step:float = 0.25  # Ensures alpha of color is rounded up to the nearest multiple of "step" (helps reducing gradients), 0 leaves alpha as is
+        self.engine:PixelateEngine = PixelateEngine.COMPOSITOR  # NumPy engine runs the same math without rendering, keeping frames in the frame store
+        self.palette_scope:PaletteScope = PaletteScope.FRAME  # Frames sharing one palette after pixelating so colors don't flicker between frames
+        self.palette_size:int = 32  # Colors in a shared palette
 class RowParam:
     def __init__(self):
         self.label:str = ""
@@ -99,6 +111,7 @@ class SpriteSheetParam:
         self.animation_rows:list[RowParam] = []
         self.assemble_param:AssembleParam = AssembleParam()
         self.delete_temp_folder:bool = True
+        self.frame_memory_limit:int = 1024  # MB of raw frames kept in memory between capture stages, the rest are memory mapped from disk
 
 
 # Visualize Methods
@@ -851,8 +864,25 @@ def get_node_groups(node_tree, collected=None):
 
 
     return collected
-def pixelate_images(image_paths:dict[str, str], param:PixelateParam):  # images = { "input/path/to/image.png" : "output/path/to/images.png" }
-    
+def create_image_from_pixels(name:str, img):
+
+    # Create a Blender image straight from decoded pixels (Blender rows start from the bottom & channels are normalized floats)
+    image = bpy.data.images.new(name, img.width, img.height, alpha=True)
+    image.alpha_mode = 'STRAIGHT'
+    flipped = img.convert("RGBA").transpose(Image.FLIP_TOP_BOTTOM)
+
+
+    # Normalize channels (Every byte is looked up on its own without NumPy, slower but gives the same values)
+    if np is not None:
+        pixels = (np.asarray(flipped, dtype=np.float32) / 255.0).ravel()
+    else:
+        channel_values = [value / 255.0 for value in range(256)]
+        pixels = array('f', [channel_values[value] for value in flipped.tobytes()])
+    image.pixels.foreach_set(pixels)
+    image.update()
+    return image
+def import_pixelate_scene():  # Returns pixelate scene, importing it from the blend file only if it doesn't exist yet
+
     # Get pixelate scene
     pixelate_scene = bpy.data.scenes.get(PIXELATE_SCENE_NAME)
 
@@ -880,13 +910,54 @@ def pixelate_images(image_paths:dict[str, str], param:PixelateParam):  # images
         pixelate_scene = data_to.scenes[0]
         if not pixelate_scene:
             raise Exception(f"scene '{PIXELATE_SCENE_NAME}' is invalid!")
+
+
+    return pixelate_scene
+def remove_pixelate_scene():
+
+    # Return if pixelate scene was never imported
+    pixelate_scene = bpy.data.scenes.get(PIXELATE_SCENE_NAME)
+    if pixelate_scene is None:
+        return
+
+
+    # Remove scene along with its composition groups (Removing scene won't remove node groups)
+    all_node_groups = get_node_groups(pixelate_scene.compositing_node_group)
+    bpy.data.scenes.remove(pixelate_scene)
+    for group in all_node_groups:
+        if group is not None:
+            bpy.data.node_groups.remove(group)
+def create_pixelate_view_transform(pixelate_scene):  # Returns view transform the pixelate scene saves frames with, for the NumPy engine to apply the same one
+
+    # Dithering is left out since it only moves colors by a fraction of a step
+    view_settings = pixelate_scene.view_settings
+    if view_settings.use_curve_mapping:
+        log(f"Curve mapping of scene '{pixelate_scene.name}' is not applied by the NumPy pixelate engine")
+    config_path = os.environ.get("OCIO") or os.path.join(bpy.utils.system_resource('DATAFILES', path="colormanagement"), "config.ocio")
+    return create_view_transform(config_path, pixelate_scene.display_settings.display_device, view_settings.view_transform, view_settings.look, view_settings.exposure, view_settings.gamma)
+def pixelate_images(image_paths:dict[str, str], param:PixelateParam, frame_store:FrameStore = None, keep_scene:bool = False):  # images = { "input/path/to/image.png" : "output/path/to/images.png" }
+
+    # Pixelate without the compositor if requested (Pixelate scene is still imported for the view transform its frames are saved with)
+    if param.engine == PixelateEngine.NUMPY:
+        pixelate_scene = import_pixelate_scene()
+        try:
+            view_transform = create_pixelate_view_transform(pixelate_scene)
+        finally:
+            if not keep_scene:
+                remove_pixelate_scene()
+        pixelate_files(image_paths, param, frame_store, view_transform)
+        return
+
     
-    
+    # Get pixelate scene (Imported only if not already kept from a previous call)
+    pixelate_scene = import_pixelate_scene()
+
+
     # Save old scene
     original_scene = bpy.context.scene
 
 
-    # Intentionally kept inside try so that temp scene is deleted even incase of failure
+    # Intentionally kept inside try so that temp scene is deleted even incase of failure (Unless kept for the caller to remove once it's done pixelating)
     exception = None
     try:
 
@@ -894,10 +965,6 @@ def pixelate_images(image_paths:dict[str, str], param:PixelateParam):  # images
         bpy.context.window.scene = pixelate_scene
 
 
-        # Store composition groups
-        all_node_groups = get_node_groups(pixelate_scene.compositing_node_group)  #  Storing since removing scene won't remove node groups
-
-
         # Remove and existing nodes from compositor
         tree = pixelate_scene.compositing_node_group
        
@@ -936,8 +1003,13 @@ def pixelate_images(image_paths:dict[str, str], param:PixelateParam):  # images
         for input_path in image_paths:
             log(f"Pixelating '{input_path}'")
 
-            # Skip if image not found
-            image = bpy.data.images.load(input_path)
+            # Skip if image not found (Stored frames are handed over as pixels so they aren't encoded just to be loaded again)
+            stored = frame_store.get(input_path) if frame_store is not None else None
+            if stored is not None:
+                with stored.to_image() as img:
+                    image = create_image_from_pixels(os.path.basename(input_path), img)
+            else:
+                image = bpy.data.images.load(input_path)
             if image is None:
                 log(f"Failed to load image '{input_path}'")
                 continue
@@ -946,9 +1018,7 @@ def pixelate_images(image_paths:dict[str, str], param:PixelateParam):  # images
             image_node.image = image
             
             # Assign Render settings
-            width, height = image.size
-            pixelate_scene.render.resolution_x = max(1, int(width * (1.0 - param.pixelation_amount)))
-            pixelate_scene.render.resolution_y = max(1, int(height * (1.0 - param.pixelation_amount)))
+            pixelate_scene.render.resolution_x, pixelate_scene.render.resolution_y = calc_pixelated_size(tuple(image.size), param.pixelation_amount)
 
             # Assign output path
             output_path = image_paths[input_path]
@@ -959,8 +1029,11 @@ def pixelate_images(image_paths:dict[str, str], param:PixelateParam):  # images
             log(f"Rendering pixelated sprite")
             bpy.ops.render.render(scene=pixelate_scene.name, write_still=True)
 
-            # Unload image from memory
+            # Unload image from memory (Rendered file is now newer than any stored pixels)
             bpy.data.images.remove(image)
+            if frame_store is not None:
+                frame_store.discard(input_path)
+                frame_store.discard(output_path)
 
             log(f"Pixelated to '{output_path}'")
     except Exception as e:
@@ -970,13 +1043,8 @@ def pixelate_images(image_paths:dict[str, str], param:PixelateParam):  # images
 
     # Set back old values
     bpy.context.window.scene = original_scene
-    bpy.data.scenes.remove(pixelate_scene)
-
-
-    # Remove composition groups
-    for group in all_node_groups:
-        if group is not None:
-            bpy.data.node_groups.remove(group)
+    if not keep_scene:
+        remove_pixelate_scene()
 
 
     # Throw exception incase of failure
@@ -1005,9 +1073,12 @@ class SpriteSheetMaker():
         self.on_sprite_creating.broadcast()
         render(output_path)
         self.on_sprite_created.broadcast()
-    def create_sprite_sheet_impl(self, param:SpriteSheetParam, temp_dir:str, temp_actions:list):
+    def create_sprite_sheet_impl(self, param:SpriteSheetParam, temp_dir:str, temp_actions:list, frame_store:FrameStore):
 
         # Iterate through actions and capture render for each frame (Each action should have it's own folder (in order) & image names should be 1, 2, 3 for each frame respectively)
+        manifest_rows = []  # [(row folder path, label, [frame path, ...], flip h, flip v), ...]
+        sheet_palette_frames = []  # Pixelated frames of every row sharing the sheet's palette
+        sheet_palette_size = 0
         for i, row in enumerate(param.animation_rows):
 
             # Resolve effective capture items (swaps in a scaled temp action when using custom frame count)
@@ -1054,7 +1125,8 @@ class SpriteSheetMaker():
 
             # Create folder for this row
             clean_label = bpy.path.clean_name(row.label.strip())
-            folder_name = f"{i}_{clean_label if clean_label !='' else UNTITLED_FOLDER_NAME}"
+            row_name = clean_label if clean_label !='' else UNTITLED_FOLDER_NAME
+            folder_name = f"{i}_{row_name}"
             log(f"Creating folder {folder_name}")
             action_dir = create_folder(temp_dir, folder_name)
             
@@ -1108,10 +1180,6 @@ class SpriteSheetMaker():
                 sprite_output_file = f"{action_dir}/{frame}.{bpy.context.scene.render.image_settings.file_format.lower()}"
                 self.create_sprite(camera, sprite_output_file)
 
-                # Flip sprite horizontally or vertically
-                if(row.to_flip_h or row.to_flip_v):
-                    flip_image(sprite_output_file, row.to_flip_h, row.to_flip_v)
-                
                 # Store path to pixelate
                 pixelate_dict[sprite_output_file] = None
 
@@ -1137,11 +1205,39 @@ class SpriteSheetMaker():
             
             # pixelate if required
             if(row.to_pixelate):
-                pixelate_images(pixelate_dict, row.pixelate_param)
+                pixelate_images(pixelate_dict, row.pixelate_param, frame_store, keep_scene=True)
+
+                # Map frames onto a palette shared by the whole row, or leave them for the sheet's palette once all rows are captured
+                if(row.pixelate_param.palette_scope == PaletteScope.ROW):
+                    quantize_frames_to_palette(list(pixelate_dict.keys()), row.pixelate_param.palette_size, frame_store)
+                elif(row.pixelate_param.palette_scope == PaletteScope.SHEET):
+                    sheet_palette_frames += list(pixelate_dict.keys())
+                    sheet_palette_size = max(sheet_palette_size, row.pixelate_param.palette_size)
+
+
+            # Add row to manifest (Frames are final once pixelated, flipping is left to assembly so frames aren't rewritten while rendering)
+            manifest_rows.append((action_dir, row_name, list(pixelate_dict.keys()), row.to_flip_h, row.to_flip_v))
+            write_row_flip(action_dir, row.to_flip_h, row.to_flip_v)
 
 
             # Notify completed row creation
             self.on_sheet_row_created.broadcast(row.label, frame_end)
+
+
+        # Map frames of rows sharing the sheet's palette (Largest palette size of those rows is used)
+        if(len(sheet_palette_frames) != 0):
+            quantize_frames_to_palette(sheet_palette_frames, sheet_palette_size, frame_store)
+
+
+        # Write stored frames onto their files if the temp folder is kept (Otherwise they're only ever read from the store)
+        if(not param.delete_temp_folder and len(frame_store.frames) != 0):
+            log("Saving stored frames to temp folder")
+            frame_store.save()
+
+
+        # Write manifest of every captured frame so assembly doesn't need to scan the temp folder
+        manifest_path = write_frame_manifest(temp_dir, manifest_rows, frame_store)
+        log(f"Saved frame manifest to '{manifest_path}'")
     def create_sprite_sheet(self, param:SpriteSheetParam, output_path:str):
         
         # Hide all non capture items and show all capture items
@@ -1150,6 +1246,7 @@ class SpriteSheetMaker():
         original_resolution_x = bpy.context.scene.render.resolution_x
         original_resolution_y = bpy.context.scene.render.resolution_y
         temp_actions = []  # Tracks temp scaled actions so they get deleted even on failure
+        frame_store = None
 
 
         # Intentionally kept inside try so that visibility is restored even incase of failure
@@ -1160,19 +1257,30 @@ class SpriteSheetMaker():
             temp_dir = create_folder(os.path.dirname(output_path), TEMP_FOLDER_NAME)
 
             
-            # Create images required for sheet 
-            self.create_sprite_sheet_impl(param, temp_dir, temp_actions)
+            # Create images required for sheet (Frames edited after rendering are passed along as raw pixels)
+            frame_store = FrameStore(os.path.join(temp_dir, FRAME_STORE_FOLDER_NAME), param.frame_memory_limit * 1024 * 1024)
+            self.create_sprite_sheet_impl(param, temp_dir, temp_actions, frame_store)
 
 
             # Combine images together into single file and paste in output
-            assemble_images(param.assemble_param, temp_dir, output_path)
+            assemble_images(param.assemble_param, temp_dir, output_path, frame_store)
 
 
             # Delete temp folder
+            frame_store.close()
             if param.delete_temp_folder:
                 shutil.rmtree(temp_dir)
         except Exception as e:
             log(f"Failed while capturing sprite sheet frames: {e} \n {traceback.format_exc()}")
+
+            # Write stored frames onto the temp folder that's kept behind & describe them again, so it can still be combined later
+            if frame_store is not None and len(frame_store.frames) != 0:
+                try:
+                    log("Saving stored frames to temp folder")
+                    frame_store.save()
+                    refresh_frame_manifest(temp_dir)
+                except Exception as save_error:
+                    log(f"Failed to save stored frames to temp folder: {save_error}")
             raise e
         finally:
 
@@ -1181,6 +1289,12 @@ class SpriteSheetMaker():
             bpy.context.scene.camera = original_camera
             bpy.context.scene.render.resolution_x = original_resolution_x
             bpy.context.scene.render.resolution_y = original_resolution_y
+            if frame_store is not None:
+                frame_store.close()
+
+            # Delete pixelate scene kept across rows
+            if any(row.to_pixelate for row in param.animation_rows):
+                remove_pixelate_scene()
 
             # Delete any temp scaled actions created for custom frame count rows
             for temp_action in temp_actions:
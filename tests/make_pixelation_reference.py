@@ -0,0 +1,105 @@
+# Renders the reference frames test_pixelation.py checks the NumPy pixelate engine against, run inside Blender:
+#   blender --background --factory-startup --python tests/make_pixelation_reference.py
+import os
+import sys
+import json
+import bpy
+import numpy as np
+from PIL import Image
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.pixelation import calc_pixelated_size
+from modules.sprite_sheet_utils import import_pixelate_scene, remove_pixelate_scene, IMAGE_INPUT_NODE, COLOR_AMOUNT_NODE, MIN_ALPHA_NODE, ALPHA_STEP_NODE
+
+
+# Properties
+REFERENCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pixelation_reference")
+CASES_FILE_NAME = "cases.json"
+STANDARD_SUFFIX = "_standard"
+VIEW_SUFFIXES = ["", STANDARD_SUFFIX]  # Scene's own view transform, then Standard
+PARAMS = [  # (pixelation amount, color amount, min alpha, alpha step)
+    (0.0, 50.0, 0.0, 0.0),
+    (0.5, 8.0, 0.0, 0.25),
+    (0.75, 4.0, 0.3, 0.1),
+    (0.9, 50.0, 0.0, 0.25),
+    (0.33, 12.0, 0.5, 0.2)
+]
+
+
+# Methods
+def generate_inputs():  # Returns { input name: RGBA pixels }
+    rng = np.random.default_rng(0)
+    inputs = {}
+
+    y, x = np.mgrid[0:64, 0:96]
+    gradient = np.zeros((64, 96, 4), dtype=np.uint8)
+    gradient[..., 0] = x * 255 // 95
+    gradient[..., 1] = y * 255 // 63
+    gradient[..., 2] = (x + y) % 256
+    gradient[..., 3] = 255
+    inputs["gradient"] = gradient
+
+    faded = gradient.copy()
+    faded[..., 3] = x * 255 // 95
+    inputs["faded"] = faded
+
+    inputs["noise"] = rng.integers(0, 256, (50, 37, 4), dtype=np.uint8)
+    inputs["odd"] = rng.integers(0, 256, (23, 17, 4), dtype=np.uint8)
+
+    shape = np.zeros((40, 40, 4), dtype=np.uint8)
+    shape[8:32, 8:32] = (200, 80, 30, 255)
+    shape[12:28, 12:28, 3] = 128
+    inputs["shape"] = shape
+    return inputs
+
+def render_case(pixelate_scene, input_path, output_path, params):
+    pixelation_amount, color_amount, min_alpha, alpha_step = params
+    tree = pixelate_scene.compositing_node_group
+    tree.nodes[COLOR_AMOUNT_NODE].outputs[0].default_value = color_amount
+    tree.nodes[MIN_ALPHA_NODE].outputs[0].default_value = min_alpha
+    tree.nodes[ALPHA_STEP_NODE].outputs[0].default_value = alpha_step
+
+    image = bpy.data.images.load(input_path)
+    tree.nodes[IMAGE_INPUT_NODE].image = image
+    pixelate_scene.render.resolution_x, pixelate_scene.render.resolution_y = calc_pixelated_size(tuple(image.size), pixelation_amount)
+    pixelate_scene.render.filepath = output_path
+    bpy.ops.render.render(scene=pixelate_scene.name, write_still=True)
+    bpy.data.images.remove(image)
+
+def get_view(pixelate_scene):
+    view_settings = pixelate_scene.view_settings
+    return { "display": pixelate_scene.display_settings.display_device, "view_transform": view_settings.view_transform, "look": view_settings.look, "exposure": view_settings.exposure, "gamma": view_settings.gamma }
+def main():
+
+    # Save inputs
+    os.makedirs(REFERENCE_DIR, exist_ok=True)
+    input_names = []
+    for name, pixels in generate_inputs().items():
+        input_names.append((name, f"input_{name}.png"))
+        Image.fromarray(pixels, "RGBA").save(os.path.join(REFERENCE_DIR, input_names[-1][1]))
+
+
+    # Render every case with the scene's own view transform, then again with Standard so the math is checked even without OpenColorIO
+    pixelate_scene = import_pixelate_scene()
+    cases = []
+    try:
+        for suffix in VIEW_SUFFIXES:
+            if suffix == STANDARD_SUFFIX:
+                pixelate_scene.view_settings.view_transform = 'Standard'
+                pixelate_scene.view_settings.look = 'None'
+            view = get_view(pixelate_scene)
+            for name, input_name in input_names:
+                for i, params in enumerate(PARAMS):
+                    output_name = f"compositor_{name}_{i}{suffix}.png"
+                    render_case(pixelate_scene, os.path.join(REFERENCE_DIR, input_name), os.path.join(REFERENCE_DIR, output_name), params)
+                    pixelation_amount, color_amount, min_alpha, alpha_step = params
+                    cases.append({ "input": input_name, "output": output_name, "pixelation_amount": pixelation_amount, "color_amount": color_amount, "min_alpha": min_alpha, "alpha_step": alpha_step, **view })
+    finally:
+        remove_pixelate_scene()
+
+    with open(os.path.join(REFERENCE_DIR, CASES_FILE_NAME), 'w') as file:
+        json.dump({ "blender_version": bpy.app.version_string, "cases": cases }, file, indent=4)
+    print(f"Rendered {len(cases)} reference frames into {REFERENCE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# Checks that the NumPy composite backend pastes frames onto sheets exactly like the Pillow one
+import os
+import sys
+import random
+import pytest
+from PIL import Image, ImageDraw
+pytest.importorskip("numpy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.combine_frames import AssembleParam, CombineMode, CompositeBackend, SpriteConsistency, assemble_images
+
+
+# Properties
+BACKGROUNDS = [(0.0, 0.0, 0.0, 0.0), (0.2, 0.4, 0.6, 0.5), (0.9, 0.3, 0.1, 1.0)]  # Transparent, translucent & opaque so every paste path gets checked
+ROW_COUNT = 3
+FRAME_COUNT = 5
+
+
+# Methods
+def generate_frames(input_dir:str):
+
+    # Frames of different sizes with soft, translucent & fully transparent pixels
+    rnd = random.Random(0)
+    for row in range(ROW_COUNT):
+        row_dir = os.path.join(input_dir, f"{row}_Row{row}")
+        os.makedirs(row_dir)
+        for frame in range(FRAME_COUNT):
+            size = (rnd.randint(8, 40), rnd.randint(8, 40))
+            img = Image.new("RGBA", size, (0, 0, 0, 0))
+            draw = ImageDraw.Draw(img)
+            for _ in range(4):
+                x, y = rnd.randint(0, size[0] - 1), rnd.randint(0, size[1] - 1)
+                color = (rnd.randint(0, 255), rnd.randint(0, 255), rnd.randint(0, 255), rnd.randint(1, 255))
+                draw.ellipse((x - 6, y - 6, x + 6, y + 6), fill=color)
+            img.save(os.path.join(row_dir, f"{frame}.png"))
+def assemble_sheet(input_dir:str, output_path:str, backend:CompositeBackend, background_color:tuple, consistency:SpriteConsistency):
+    param = AssembleParam()
+    param.combine_mode = CombineMode.SHEET
+    param.consistency = consistency
+    param.background_color = background_color
+    param.composite_backend = backend
+    assemble_images(param, input_dir, output_path)
+    with Image.open(output_path) as img:
+        return img.mode, img.size, img.tobytes()
+
+
+# Tests
+@pytest.mark.parametrize("consistency", list(SpriteConsistency), ids=lambda consistency: consistency.name)
+@pytest.mark.parametrize("background_color", BACKGROUNDS, ids=lambda color: f"alpha_{color[3]}")
+def test_backends_give_identical_sheets(tmp_path, background_color, consistency):
+    input_dir = str(tmp_path / "frames")
+    generate_frames(input_dir)
+    sheets = [assemble_sheet(input_dir, str(tmp_path / f"sheet_{backend.name}.png"), backend, background_color, consistency) for backend in CompositeBackend]
+    assert sheets[0] == sheets[1]
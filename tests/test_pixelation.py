@@ -0,0 +1,54 @@
+# Checks the NumPy pixelate engine against frames rendered by the compositor, regenerate them with make_pixelation_reference.py
+# Cases saved through a view transform other than Standard need PyOpenColorIO & the OCIO environment variable pointing at Blender's datafiles/colormanagement/config.ocio
+import os
+import sys
+import json
+import pytest
+from types import SimpleNamespace
+from PIL import Image
+np = pytest.importorskip("numpy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules import pixelation
+from modules.pixelation import pixelate_frames, create_view_transform
+
+
+# Properties
+REFERENCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pixelation_reference")
+CHANNEL_TOLERANCE = 1  # Compositor dithers its output & float error may land a channel on the next byte
+MAX_TIE_RATIO = 0.001  # Visible pixels whose value lands right on a rounding tie may round to the next color step
+
+
+# Methods
+def load_cases():
+    with open(os.path.join(REFERENCE_DIR, "cases.json"), 'r') as file:
+        return json.load(file)["cases"]
+def load_pixels(file_name:str):
+    with Image.open(os.path.join(REFERENCE_DIR, file_name)) as img:
+        return np.asarray(img.convert("RGBA")).astype(np.int32)
+def get_view_transform(case):
+
+    # Standard needs no view transform, anything else is applied through OpenColorIO
+    if case["view_transform"] == "Standard" and case["look"] == "None" and case["exposure"] == 0.0 and case["gamma"] == 1.0:
+        return None
+    if pixelation.ocio is None or "OCIO" not in os.environ:
+        pytest.skip(f"'{case['view_transform']}' view transform needs PyOpenColorIO & the OCIO environment variable set to Blender's config.ocio")
+    return create_view_transform(os.environ["OCIO"], case["display"], case["view_transform"], case["look"], case["exposure"], case["gamma"])
+
+
+# Tests
+@pytest.mark.parametrize("case", load_cases(), ids=lambda case: case["output"])
+def test_numpy_engine_matches_compositor(case):
+    param = SimpleNamespace(**{ key: case[key] for key in ["pixelation_amount", "color_amount", "min_alpha", "alpha_step"] })
+    view_transform = get_view_transform(case)
+    with Image.open(os.path.join(REFERENCE_DIR, case["input"])) as img:
+        result = np.asarray(pixelate_frames([img], param, view_transform)[0].convert("RGBA")).astype(np.int32)
+    reference = load_pixels(case["output"])
+    assert result.shape == reference.shape
+
+    # Alpha matches everywhere
+    assert np.abs(result[..., 3] - reference[..., 3]).max() <= CHANNEL_TOLERANCE
+
+    # Colors match wherever they're visible, apart from the odd rounding tie
+    visible = (result[..., 3] > 0) & (reference[..., 3] > 0)
+    color_diff = np.abs(result[..., :3] - reference[..., :3]).max(axis=-1)[visible]
+    assert (color_diff > CHANNEL_TOLERANCE).sum() <= max(1, int(visible.sum() * MAX_TIE_RATIO))